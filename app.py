@@ -7,10 +7,14 @@ Launch with: streamlit run app_enhanced.py
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime, timedelta
+import io
+import re
+import sqlite3
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add src to path
@@ -18,12 +22,18 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from src.pipeline import FinancePipeline
 
+try:
+    import orjson  # optional: much faster JSON exports
+except ImportError:
+    orjson = None
+
 # ============================================================================
 # CUSTOM CSS STYLING
 # ============================================================================
 
-def load_custom_css():
-    st.markdown("""
+# Emitted on every run: Streamlit drops elements a rerun does not re-send,
+# so a once-per-session guard would strip the styling after the first click
+CUSTOM_CSS = """
     <style>
     /* Main theme colors */
     :root {
@@ -221,7 +231,36 @@ def load_custom_css():
         overflow: hidden;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def load_custom_css():
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+# Settings > Appearance color preview, one grid instead of four columns
+COLOR_SWATCHES_HTML = """
+<div style="display: grid; grid-template-columns: repeat(4, 1fr); gap: 1rem; text-align: center; color: white; font-weight: bold;">
+    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 2rem; border-radius: 8px;">Primary</div>
+    <div style="background: #2ecc71; padding: 2rem; border-radius: 8px;">Success</div>
+    <div style="background: #e74c3c; padding: 2rem; border-radius: 8px;">Error</div>
+    <div style="background: #f39c12; padding: 2rem; border-radius: 8px;">Warning</div>
+</div>
+"""
+
+SIDEBAR_FOOTER = """
+---
+
+🔧 Door 865 - PhiSHRI
+
+v2.0.0 Enhanced Edition
+
+---
+
+💡 **Pro Tip:** Bookmark frequently used queries
+
+📖 [View Documentation](docs/QUICKSTART.md)
+
+🐛 [Report Issues](https://github.com/yourusername/FinancePipeline)
+"""
 
 # ============================================================================
 # HELPER FUNCTIONS
@@ -250,6 +289,350 @@ def format_number(num):
         return f"{num/1_000:.2f}K"
     return str(num)
 
+@st.cache_data(ttl=10, show_spinner=False)
+def _db_size_mb():
+    """Database size in MB from SQLite's page count (None on error), re-read at most every 10s"""
+    try:
+        return pipeline.db_size() / (1024 * 1024)
+    except sqlite3.Error:
+        return None
+
+def lttb_indices(y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling: positions of n_out points
+    that preserve the visual shape of y (x is the row position)
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    x = np.arange(n, dtype=float)
+    # First and last points are kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    picked = np.empty(n_out, dtype=int)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+def rolling_means(values, windows):
+    """
+    Trailing means for several window sizes from one shared cumulative sum
+    
+    Returns {window: array}; each is NaN until its window is full or while the
+    window holds a NaN (same result as Series.rolling(window).mean())
+    """
+    v = np.asarray(values, dtype=float)
+    valid = ~np.isnan(v)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, v, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    means = {}
+    for window in windows:
+        out = np.full(len(v), np.nan)
+        if len(v) >= window:
+            win_sum = sums[window:] - sums[:-window]
+            full = counts[window:] - counts[:-window] == window
+            out[window - 1:] = np.where(full, win_sum / window, np.nan)
+        means[window] = out
+    return means
+
+def bucket_ohlc(df, n_out):
+    """Merge consecutive OHLCV rows into at most n_out bars (extra columns keep their last value)"""
+    size = -(-len(df) // n_out)
+    spec = {col: 'last' for col in df.columns}
+    spec.update(timestamp='first', open='first', high='max', low='min', close='last', volume='sum')
+    return df.groupby(np.arange(len(df)) // size).agg(spec)
+
+def bucket_volume(volume, picked):
+    """Volume summed onto downsampled rows: each picked row gets every row since the previous pick"""
+    starts = np.concatenate(([0], np.asarray(picked[:-1]) + 1))
+    return np.add.reduceat(np.nan_to_num(np.asarray(volume, dtype=float)), starts)
+
+def parse_symbols(text):
+    """Upper-cased tickers from free-text input, in order, without duplicates"""
+    return list(dict.fromkeys(SYMBOL_RE.findall(text.upper())))
+
+def records_json(df):
+    """Serialize a DataFrame as a compact JSON array of records (bytes)"""
+    if orjson is not None:
+        return orjson.dumps(
+            df.to_dict(orient='records'),
+            default=str,
+            option=orjson.OPT_SERIALIZE_NUMPY
+        )
+    buf = io.BytesIO()
+    df.to_json(buf, orient='records')
+    return buf.getvalue()
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def csv_bytes(df):
+    """CSV export of df, encoded once per distinct frame rather than every rerun"""
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def json_bytes(df):
+    """JSON records export of df, encoded once per distinct frame"""
+    return records_json(df)
+
+# Price charts longer than PLOT_DOWNSAMPLE_ABOVE rows are thinned to
+# PLOT_MAX_POINTS before plotting; statistics still use every row
+PLOT_DOWNSAMPLE_ABOVE = 3000
+PLOT_MAX_POINTS = 2000
+WEBGL_ABOVE = 5000
+
+# Window functions (moving averages in SQL) need SQLite 3.25+; older
+# builds compute them client-side with rolling_means()
+SQL_WINDOW_FUNCTIONS = sqlite3.sqlite_version_info >= (3, 25, 0)
+
+# Top Movers: first and last close of the 30-day window per symbol, located
+# in one pass over the (symbol, timestamp) primary key
+TOP_MOVERS_SQL = """
+    WITH ranked AS (
+        SELECT symbol, close,
+               ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp) AS rn_asc,
+               ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp DESC) AS rn_desc
+        FROM daily_prices
+        WHERE timestamp >= date('now', '-30 days')
+    ),
+    ends AS (
+        SELECT symbol,
+               MAX(CASE WHEN rn_asc = 1 THEN close END) AS price_30d_ago,
+               MAX(CASE WHEN rn_desc = 1 THEN close END) AS latest_price
+        FROM ranked
+        GROUP BY symbol
+    )
+    SELECT s.symbol, s.name, s.sector, e.price_30d_ago, e.latest_price,
+           ROUND((e.latest_price - e.price_30d_ago) / e.price_30d_ago * 100, 2) AS change_pct
+    FROM ends e
+    JOIN symbols s ON s.symbol = e.symbol
+    WHERE e.price_30d_ago > 0
+    ORDER BY ABS(change_pct) DESC
+    LIMIT 20
+"""
+
+# Same result without window functions, via SQLite's bare-column MIN()/MAX()
+TOP_MOVERS_SQL_LEGACY = """
+    WITH first AS (
+        SELECT symbol, close AS price_30d_ago, MIN(timestamp)
+        FROM daily_prices WHERE timestamp >= date('now', '-30 days')
+        GROUP BY symbol
+    ),
+    last AS (
+        SELECT symbol, close AS latest_price, MAX(timestamp)
+        FROM daily_prices WHERE timestamp >= date('now', '-30 days')
+        GROUP BY symbol
+    )
+    SELECT s.symbol, s.name, s.sector, f.price_30d_ago, l.latest_price,
+           ROUND((l.latest_price - f.price_30d_ago) / f.price_30d_ago * 100, 2) AS change_pct
+    FROM first f
+    JOIN last l ON l.symbol = f.symbol
+    JOIN symbols s ON s.symbol = f.symbol
+    WHERE f.price_30d_ago > 0
+    ORDER BY ABS(change_pct) DESC
+    LIMIT 20
+"""
+
+# One ticker per match in comma/space/semicolon-separated input, kept
+# permissive enough for ^GSPC, BTC-USD and EURUSD=X
+SYMBOL_RE = re.compile(r'[^\s,;]+')
+
+# Symbols per yf.download() request in the Data Fetcher
+FETCH_CHUNK_SIZE = 20
+
+# Rows read from a SQL editor query before it is cut off
+SQL_EDITOR_MAX_ROWS = 10000
+
+# Settings > Vacuum only rewrites the database when at least this share of
+# its pages is free
+VACUUM_MIN_FREE_RATIO = 0.10
+
+# Chart Analysis look-back windows
+TIME_RANGE_DAYS = {
+    "1 Month": 30,
+    "3 Months": 90,
+    "6 Months": 180,
+    "1 Year": 365,
+    "2 Years": 730,
+    "5 Years": 1825
+}
+
+# SQL editor examples
+EXAMPLE_QUERIES = {
+    "Top 10 Symbols": "SELECT symbol, name, sector, market_cap FROM symbols LIMIT 10",
+    "Recent Prices": """SELECT s.symbol, s.name, p.close, p.timestamp 
+FROM symbols s 
+JOIN daily_prices p ON s.symbol = p.symbol 
+WHERE p.timestamp >= date('now', '-7 days')
+ORDER BY p.timestamp DESC 
+LIMIT 100""",
+    "Technology Sector": """SELECT symbol, name, market_cap 
+FROM symbols 
+WHERE sector = 'Technology' 
+ORDER BY market_cap DESC 
+LIMIT 50""",
+    "Price Summary": """SELECT 
+    symbol,
+    MIN(close) as low,
+    MAX(close) as high,
+    AVG(close) as avg,
+    COUNT(*) as days
+FROM daily_prices
+GROUP BY symbol
+ORDER BY days DESC
+LIMIT 20"""
+}
+
+# Attempts for reads that hit "database is locked" during a long write
+LOCK_RETRIES = 3
+
+EMPTY_STATS = {'sym': 0, 'prices': 0, 'eq': 0, 'etf': 0, 'crypto': 0, 'latest': None, 'api_calls': 0}
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _dashboard_stats():
+    """Sidebar and Dashboard summary figures, fetched in one query and cached"""
+    return pipeline.dashboard_stats('yahoo_finance', hours=24)
+
+def retry_locked(fn, *args, **kwargs):
+    """
+    Call fn, retrying with exponential backoff while SQLite reports the
+    database as locked (busy_timeout already absorbs short waits)
+    """
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return fn(*args, **kwargs)
+        except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+            if 'locked' not in str(e) or attempt == LOCK_RETRIES - 1:
+                raise
+            wait = 0.05 * 2 ** attempt
+            print(f"[WARN] Database locked, retrying in {wait:.2f}s")
+            time.sleep(wait)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _recent_api_calls():
+    """Settings: API calls per source over the last 24 hours"""
+    # Cutoff uses the local ISO format log_api_call() writes. The unary + keeps
+    # the planner off idx_api_calls_source (a full scan to avoid sorting) so
+    # the range is read from the covering idx_api_calls_ts_source instead
+    cutoff = (datetime.now() - timedelta(hours=24)).isoformat()
+    rows, columns = retry_locked(pipeline.query_raw, """
+        SELECT source, COUNT(*) as calls, MAX(timestamp) as last_call
+        FROM api_calls
+        WHERE timestamp >= ?
+        GROUP BY +source
+        ORDER BY calls DESC
+    """, [cutoff])
+    # A handful of rows: plain records skip building a DataFrame
+    return [dict(zip(columns, row)) for row in rows]
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _table_stats(schema_version):
+    """
+    Settings: user tables with their index counts, as plain records. Keyed
+    by pipeline.schema_version(), so it is recomputed only after the schema
+    changes.
+    """
+    rows, columns = pipeline.query_raw("""
+        SELECT 
+            name as table_name,
+            (SELECT COUNT(*) FROM sqlite_master WHERE type='index' AND tbl_name=m.name) as index_count
+        FROM sqlite_master m
+        WHERE type='table'
+        AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+    """)
+    return [dict(zip(columns, row)) for row in rows]
+
+@st.cache_resource(show_spinner=False)
+def db_executor():
+    """Single worker thread, shared by all sessions, for long-running database maintenance"""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-maintenance")
+
+@st.fragment(run_every=1)
+def db_job_progress():
+    """Poll the background maintenance job; reruns the page once it has finished"""
+    future, label, started = st.session_state.db_job
+    if not future.done():
+        st.info(f"⏳ {label} running in the background ({time.perf_counter() - started:.0f}s)")
+        return
+    del st.session_state.db_job
+    error = future.exception()
+    st.session_state.db_job_result = (
+        label, error, None if error else future.result(), time.perf_counter() - started
+    )
+    st.rerun()
+
+def free_page_ratio():
+    """Share of database pages on the freelist, i.e. what VACUUM would reclaim"""
+    free, total = pipeline.free_pages()
+    return free / total if total else 0.0
+
+@st.cache_data(ttl=300, max_entries=128, show_spinner=False)
+def cached_query(sql, params=(), dtype_backend=None):
+    """pipeline.query memoized on (sql, params); params must be a hashable tuple"""
+    return pipeline.query(sql, list(params), dtype_backend=dtype_backend)
+
+@st.fragment
+def sector_chart():
+    """Top Sectors bar chart; a fragment so it can redraw without the whole page"""
+    try:
+        if pipeline.refresh_sector_cache_if_stale():
+            cached_query.clear()
+        sectors = cached_query("SELECT sector, count FROM sectors_top8 ORDER BY count DESC")
+        
+        if not sectors.empty:
+            # Native Vega-Lite chart, so the Dashboard never loads Plotly.
+            # Ordered categories keep the bars in count order.
+            sectors['sector'] = pd.Categorical(sectors['sector'], categories=sectors['sector'], ordered=True)
+            st.bar_chart(sectors, x='sector', y='count', horizontal=True, height=400)
+        else:
+            st.info("💡 No sector data available. Load symbols first.")
+    except Exception as e:
+        st.error(f"Error loading sector data: {e}")
+
+@st.fragment(run_every=30)
+def api_calls_metric():
+    """Dashboard API call count; re-counts itself every 30s without rerunning the page"""
+    try:
+        calls = pipeline.get_api_usage('yahoo_finance', hours=24)
+    except sqlite3.Error:
+        calls = "N/A"
+    st.metric("🔌 Yahoo Finance Calls (24h)", f"{calls}",
+             help="Yahoo Finance has no rate limits!")
+
+@st.fragment
+def db_status_panel():
+    """Dashboard database status; the Backup button reruns only this panel"""
+    st.subheader("💾 Database Status")
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        db_size = _db_size_mb()
+        if db_size is not None:
+            st.info(f"**💽 Database Size:** {db_size:.2f} MB")
+        else:
+            st.info("**💽 Database Size:** Unknown")
+
+    with col2:
+        st.info(f"**📂 Location:** `{DB_NAME}`")
+
+    with col3:
+        if st.button("🔄 Backup Database", use_container_width=True):
+            with st.spinner("Creating backup..."):
+                try:
+                    backup_path = pipeline.backup()
+                    st.success(f"✅ Backup created: {Path(backup_path).name}")
+                except Exception as e:
+                    st.error(f"❌ Backup failed: {e}")
+
 # ============================================================================
 # PAGE CONFIGURATION
 # ============================================================================
@@ -277,6 +660,7 @@ if 'pipeline' not in st.session_state:
         st.stop()
 
 pipeline = st.session_state.pipeline
+DB_NAME = Path(pipeline.db_path).name
 
 # ============================================================================
 # SIDEBAR NAVIGATION
@@ -312,20 +696,22 @@ with st.sidebar:
     st.markdown("### 📈 Quick Stats")
     
     try:
-        symbol_count = pipeline.query("SELECT COUNT(*) as count FROM symbols")['count'].iloc[0]
-        st.metric("Symbols", format_number(symbol_count), label_visibility="visible")
-    except:
-        st.metric("Symbols", "0", label_visibility="visible")
-    
-    try:
-        price_count = pipeline.query("SELECT COUNT(*) as count FROM daily_prices")['count'].iloc[0]
-        st.metric("Price Records", format_number(price_count), label_visibility="visible")
-    except:
-        st.metric("Price Records", "0", label_visibility="visible")
-    
-    st.markdown("---")
-    st.caption("🔧 Door 865 - PhiSHRI")
-    st.caption("v2.0.0 Enhanced Edition")
+        stats = _dashboard_stats()
+    except Exception:
+        stats = EMPTY_STATS
+    
+    st.metric("Symbols", format_number(stats['sym']), label_visibility="visible")
+    st.metric("Price Records", format_number(stats['prices']), label_visibility="visible")
+    
+    # Rebuild the sector cache and drop every memoized read so the next run
+    # queries SQLite afresh
+    if st.button("🔄 Refresh Data", use_container_width=True):
+        pipeline.refresh_sector_cache()
+        for cached in (cached_query, _dashboard_stats, _recent_api_calls, _table_stats, _db_size_mb):
+            cached.clear()
+        for key in ('watchlist_names', 'symbol_search_key'):
+            st.session_state.pop(key, None)
+        st.rerun()
 
 # ============================================================================
 # DASHBOARD PAGE
@@ -341,38 +727,18 @@ if page == "🏠 Dashboard":
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        try:
-            symbol_count = pipeline.query("SELECT COUNT(*) as count FROM symbols")
-            count = symbol_count['count'].iloc[0] if not symbol_count.empty else 0
-            st.metric("💼 Total Symbols", f"{count:,}", help="Total number of symbols in database")
-        except:
-            st.metric("💼 Total Symbols", "0")
+        st.metric("💼 Total Symbols", f"{stats['sym']:,}", help="Total number of symbols in database")
     
     with col2:
-        try:
-            price_count = pipeline.query("SELECT COUNT(*) as count FROM daily_prices")
-            count = price_count['count'].iloc[0] if not price_count.empty else 0
-            st.metric("📈 Price Records", f"{count:,}", help="Total price data points")
-        except:
-            st.metric("📈 Price Records", "0")
+        st.metric("📈 Price Records", f"{stats['prices']:,}", help="Total price data points")
     
     with col3:
-        try:
-            api_usage = pipeline.get_api_usage('yahoo_finance', hours=24)
-            st.metric("🔌 Yahoo Finance Calls (24h)", f"{api_usage}",
-                     help="Yahoo Finance has no rate limits!")
-        except:
-            st.metric("🔌 Yahoo Finance Calls (24h)", "0")
+        api_calls_metric()
     
     with col4:
-        try:
-            latest = pipeline.query("SELECT MAX(timestamp) as latest FROM daily_prices")
-            if not latest.empty and not pd.isna(latest['latest'].iloc[0]):
-                latest_date = latest['latest'].iloc[0]
-                st.metric("📅 Latest Data", str(latest_date)[:10])
-            else:
-                st.metric("📅 Latest Data", "No data")
-        except:
+        if stats['latest']:
+            st.metric("📅 Latest Data", stats['latest'])
+        else:
             st.metric("📅 Latest Data", "No data")
     
     st.markdown("---")
@@ -384,30 +750,25 @@ if page == "🏠 Dashboard":
         st.subheader("📈 Recent Price Updates")
         
         try:
-            recent_prices = pipeline.query("""
-                SELECT s.symbol, s.name, p.close, p.volume, p.timestamp
+            recent_prices = cached_query("""
+                SELECT s.symbol, s.name, p.close, p.volume, DATE(p.timestamp) AS timestamp
                 FROM daily_prices p
                 JOIN symbols s ON p.symbol = s.symbol
                 ORDER BY p.timestamp DESC
                 LIMIT 15
-            """)
+            """, dtype_backend='pyarrow')
             
             if not recent_prices.empty:
-                df = recent_prices.copy()
-                df['close'] = df['close'].apply(lambda x: f"${x:.2f}")
-                df['volume'] = df['volume'].apply(lambda x: format_number(x) if pd.notna(x) else "N/A")
-                df['timestamp'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d')
-                
                 st.dataframe(
-                    df,
+                    recent_prices,
                     use_container_width=True,
                     height=400,
                     hide_index=True,
                     column_config={
                         "symbol": st.column_config.TextColumn("Symbol", width="small"),
                         "name": st.column_config.TextColumn("Name", width="medium"),
-                        "close": st.column_config.TextColumn("Price", width="small"),
-                        "volume": st.column_config.TextColumn("Volume", width="small"),
+                        "close": st.column_config.NumberColumn("Price", width="small", format="$%.2f"),
+                        "volume": st.column_config.NumberColumn("Volume", width="small", format="compact"),
                         "timestamp": st.column_config.TextColumn("Date", width="small")
                     }
                 )
@@ -419,47 +780,7 @@ if page == "🏠 Dashboard":
     with col_right:
         st.subheader("🏢 Top Sectors")
         
-        try:
-            sectors = pipeline.query("""
-                SELECT sector, COUNT(*) as count
-                FROM symbols
-                WHERE sector IS NOT NULL AND sector != ''
-                GROUP BY sector
-                ORDER BY count DESC
-                LIMIT 8
-            """)
-            
-            if not sectors.empty:
-                df = sectors.copy()
-                
-                # Create a modern donut chart
-                fig = go.Figure(data=[go.Pie(
-                    labels=df['sector'],
-                    values=df['count'],
-                    hole=.4,
-                    marker=dict(
-                        colors=px.colors.sequential.Viridis,
-                        line=dict(color='#0e1117', width=2)
-                    ),
-                    textposition='inside',
-                    textinfo='label+percent',
-                    hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percent: %{percent}<extra></extra>'
-                )])
-                
-                fig.update_layout(
-                    showlegend=False,
-                    height=400,
-                    margin=dict(t=0, b=0, l=0, r=0),
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color='#fafafa', size=11)
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("💡 No sector data available. Load symbols first.")
-        except Exception as e:
-            st.error(f"Error loading sector data: {e}")
+        sector_chart()
     
     st.markdown("---")
     
@@ -469,51 +790,17 @@ if page == "🏠 Dashboard":
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        try:
-            equity_count = pipeline.query("SELECT COUNT(*) as count FROM symbols WHERE asset_class='equity'")['count'].iloc[0]
-            st.metric("📊 Equities", format_number(equity_count))
-        except:
-            st.metric("📊 Equities", "0")
+        st.metric("📊 Equities", format_number(stats['eq']))
     
     with col2:
-        try:
-            etf_count = pipeline.query("SELECT COUNT(*) as count FROM symbols WHERE asset_class='etf'")['count'].iloc[0]
-            st.metric("🎯 ETFs", format_number(etf_count))
-        except:
-            st.metric("🎯 ETFs", "0")
+        st.metric("🎯 ETFs", format_number(stats['etf']))
     
     with col3:
-        try:
-            crypto_count = pipeline.query("SELECT COUNT(*) as count FROM symbols WHERE asset_class='crypto'")['count'].iloc[0]
-            st.metric("₿ Crypto", format_number(crypto_count))
-        except:
-            st.metric("₿ Crypto", "0")
+        st.metric("₿ Crypto", format_number(stats['crypto']))
     
     st.markdown("---")
     
-    # Database status section
-    st.subheader("💾 Database Status")
-    
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        try:
-            db_size = Path(pipeline.db_path).stat().st_size / (1024 * 1024)
-            st.info(f"**💽 Database Size:** {db_size:.2f} MB")
-        except:
-            st.info("**💽 Database Size:** Unknown")
-    
-    with col2:
-        st.info(f"**📂 Location:** `{Path(pipeline.db_path).name}`")
-    
-    with col3:
-        if st.button("🔄 Backup Database", use_container_width=True):
-            with st.spinner("Creating backup..."):
-                try:
-                    backup_path = pipeline.backup()
-                    st.success(f"✅ Backup created: {Path(backup_path).name}")
-                except Exception as e:
-                    st.error(f"❌ Backup failed: {e}")
+    db_status_panel()
 
 # ============================================================================
 # SYMBOL BROWSER PAGE
@@ -525,62 +812,127 @@ elif page == "🔍 Symbol Browser":
     
     st.markdown("---")
     
-    # Search controls in columns
-    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+    # Search controls in a form so typing doesn't requery on every keystroke
+    with st.form("symbol_search", clear_on_submit=False):
+        col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
     
-    with col1:
-        search_term = st.text_input(
-            "🔎 Search", 
-            placeholder="e.g., Apple, AAPL, Technology, Healthcare",
-            label_visibility="collapsed"
-        )
+        with col1:
+            search_term = st.text_input(
+                "🔎 Search", 
+                placeholder="e.g., Apple, AAPL, Technology, Healthcare",
+                label_visibility="collapsed"
+            )
     
-    with col2:
-        asset_class = st.selectbox(
-            "Asset Class",
-            ["All", "equity", "etf", "crypto", "forex", "fund"],
-            label_visibility="collapsed"
-        )
+        with col2:
+            asset_class = st.selectbox(
+                "Asset Class",
+                ["All", "equity", "etf", "crypto", "forex", "fund"],
+                label_visibility="collapsed"
+            )
     
-    with col3:
-        sort_by = st.selectbox(
-            "Sort by",
-            ["symbol", "name", "sector", "market_cap"],
-            label_visibility="collapsed"
-        )
+        with col3:
+            sort_by = st.selectbox(
+                "Sort by",
+                ["symbol", "name", "sector", "market_cap"],
+                label_visibility="collapsed"
+            )
     
-    with col4:
-        limit = st.number_input(
-            "Results",
-            min_value=10,
-            max_value=1000,
-            value=100,
-            step=10,
-            label_visibility="collapsed"
+        with col4:
+            limit = st.number_input(
+                "Rows per page",
+                min_value=10,
+                max_value=1000,
+                value=100,
+                step=10,
+                label_visibility="collapsed"
+            )
+        
+        use_cache = st.checkbox(
+            "Cache results across sessions",
+            value=False,
+            help="Serve repeated searches from memory for up to five minutes"
         )
+        
+        st.form_submit_button("🔎 Search")
     
-    # Build query
-    query = "SELECT * FROM symbols WHERE 1=1"
+    # Build the filter shared by the page query and the total count
+    where = " WHERE 1=1"
     params = []
     
-    if search_term:
-        query += " AND (symbol LIKE ? OR name LIKE ? OR sector LIKE ? OR industry LIKE ?)"
+    match_expr = FinancePipeline.fts_match_query(search_term) if search_term else None
+    if match_expr and pipeline.has_symbols_fts:
+        where += " AND rowid IN (SELECT rowid FROM symbols_fts WHERE symbols_fts MATCH ?)"
+        params.append(match_expr)
+    elif search_term:
+        where += " AND (symbol LIKE ? OR name LIKE ? OR sector LIKE ? OR industry LIKE ?)"
         search_pattern = f"%{search_term}%"
         params.extend([search_pattern] * 4)
     
     if asset_class != "All":
-        query += " AND asset_class = ?"
+        where += " AND asset_class = ?"
         params.append(asset_class)
     
-    query += f" ORDER BY {sort_by} LIMIT {limit}"
-    
     # Execute search
     with st.spinner("Searching..."):
         try:
-            results = pipeline.query(query, params) if params else pipeline.query(query)
+            # Only one page of `limit` rows is loaded and sent to the browser;
+            # the total comes from a separate count, cached like the page is
+            count_sql = "SELECT COUNT(*) AS n FROM symbols" + where
+            if use_cache:
+                counts = cached_query(count_sql, tuple(params))
+            else:
+                counts = pipeline.query(count_sql, params)
+            total = int(counts['n'].iloc[0])
+            page_count = max(1, -(-total // limit))
+            
+            filter_key = (search_term, asset_class, sort_by, limit)
+            if st.session_state.get('symbol_filter_key') != filter_key:
+                st.session_state.symbol_filter_key = filter_key
+                st.session_state.symbol_page = 1
+            
+            page_col, _ = st.columns([1, 5])
+            with page_col:
+                sym_page = st.number_input(
+                    f"Page (of {page_count:,})",
+                    min_value=1,
+                    max_value=page_count,
+                    step=1,
+                    key="symbol_page"
+                )
+            
+            search_key = filter_key + (sym_page,)
+            # symbol breaks ties so rows don't repeat or go missing across pages
+            order_by = sort_by if sort_by == "symbol" else f"{sort_by}, symbol"
+            query = """
+                SELECT *,
+                    CASE
+                        WHEN market_cap IS NULL THEN 'N/A'
+                        WHEN market_cap >= 1e9 THEN printf('%.2fB', market_cap / 1e9)
+                        WHEN market_cap >= 1e6 THEN printf('%.2fM', market_cap / 1e6)
+                        WHEN market_cap >= 1e3 THEN printf('%.2fK', market_cap / 1e3)
+                        ELSE CAST(market_cap AS TEXT)
+                    END AS market_cap_fmt
+                FROM symbols""" + where + f" ORDER BY {order_by} LIMIT ? OFFSET ?"
+            # Page bounds are bound too, so every page reuses one prepared statement
+            page_params = params + [limit, (sym_page - 1) * limit]
+            
+            # Only requery when a new search or page is requested; column picks
+            # and downloads rerun the page but reuse the stored results.
+            # Arrow-backed columns keep the text-heavy rows compact.
+            if st.session_state.get('symbol_search_key') != search_key:
+                if use_cache:
+                    st.session_state.symbol_search_results = cached_query(
+                        query, tuple(page_params), dtype_backend='pyarrow'
+                    )
+                else:
+                    st.session_state.symbol_search_results = pipeline.query(
+                        query, page_params, dtype_backend='pyarrow'
+                    )
+                st.session_state.symbol_search_key = search_key
+            results = st.session_state.symbol_search_results
             
             if not results.empty:
-                st.success(f"✅ Found **{len(results):,}** symbols")
+                st.success(f"✅ Found **{total:,}** symbols (showing {len(results):,} on page {sym_page})")
                 
                 # Column selector
                 available_cols = [col for col in results.columns if col in 
@@ -596,39 +948,50 @@ elif page == "🔍 Symbol Browser":
                 )
                 
                 if display_cols:
-                    df = results[display_cols].copy()
-                    
-                    # Format market cap if present
-                    if 'market_cap' in df.columns:
-                        df['market_cap'] = df['market_cap'].apply(
-                            lambda x: format_number(x) if pd.notna(x) else "N/A"
-                        )
-                    
+                    # Market cap comes pre-formatted from SQL. The stored
+                    # results are shown as-is: column_order picks the columns
+                    # instead of copying them into a new frame.
                     st.dataframe(
-                        df,
+                        results,
                         use_container_width=True,
                         height=600,
-                        hide_index=True
+                        hide_index=True,
+                        column_order=['market_cap_fmt' if col == 'market_cap' else col
+                                      for col in display_cols],
+                        column_config={"market_cap_fmt": "market_cap"}
                     )
                     
-                    # Export button
+                    # Exports are encoded only on request and kept for the
+                    # current search, not rebuilt on every rerun
+                    exports = st.session_state.get('symbol_exports')
+                    if exports is None or exports['key'] != search_key:
+                        exports = st.session_state.symbol_exports = {'key': search_key}
+                    
                     col1, col2, col3 = st.columns([1, 1, 4])
                     with col1:
-                        st.download_button(
-                            "📥 Download CSV",
-                            results.to_csv(index=False),
-                            "symbols_export.csv",
-                            "text/csv",
-                            use_container_width=True
-                        )
+                        if 'csv' not in exports and st.button("📦 Prepare CSV", use_container_width=True):
+                            buf = io.BytesIO()
+                            results.drop(columns='market_cap_fmt').to_csv(buf, index=False)
+                            exports['csv'] = buf.getvalue()
+                        if 'csv' in exports:
+                            st.download_button(
+                                "📥 Download CSV",
+                                exports['csv'],
+                                "symbols_export.csv",
+                                "text/csv",
+                                use_container_width=True
+                            )
                     with col2:
-                        st.download_button(
-                            "📄 Download JSON",
-                            results.to_json(orient='records', indent=2),
-                            "symbols_export.json",
-                            "application/json",
-                            use_container_width=True
-                        )
+                        if 'json' not in exports and st.button("📦 Prepare JSON", use_container_width=True):
+                            exports['json'] = records_json(results.drop(columns='market_cap_fmt'))
+                        if 'json' in exports:
+                            st.download_button(
+                                "📄 Download JSON",
+                                exports['json'],
+                                "symbols_export.json",
+                                "application/json",
+                                use_container_width=True
+                            )
                 else:
                     st.warning("⚠️ Please select at least one column to display")
             else:
@@ -677,7 +1040,7 @@ elif page == "📥 Data Fetcher":
             refetch = st.checkbox(
                 "Clear existing data first",
                 value=False,
-                help="Delete existing price data for these symbols before fetching"
+                help="Replace existing price data for symbols that return new data"
             )
 
         st.markdown("---")
@@ -687,35 +1050,45 @@ elif page == "📥 Data Fetcher":
         with col1:
             if st.button("🚀 Fetch Data", type="primary", use_container_width=True):
                 if symbols_input:
-                    symbols = [s.strip().upper() for s in symbols_input.split(',')]
+                    symbols = parse_symbols(symbols_input)
 
                     progress_bar = st.progress(0)
                     status_text = st.empty()
 
-                    success_count = 0
-                    fail_count = 0
+                    # One multi-ticker download per chunk; chunking keeps the
+                    # progress bar moving on long symbol lists
+                    loaded = {}
+                    done = 0
 
-                    for i, symbol in enumerate(symbols):
-                        status_text.text(f"Fetching {symbol}... ({i+1}/{len(symbols)})")
+                    # Each chunk downloads first, then writes in its own short
+                    # transaction, so no write lock is held over the network
+                    for start in range(0, len(symbols), FETCH_CHUNK_SIZE):
+                        chunk = symbols[start:start + FETCH_CHUNK_SIZE]
+                        status_text.text(f"Fetching {', '.join(chunk)}... ({done + len(chunk)}/{len(symbols)})")
 
                         try:
-                            if refetch:
-                                pipeline.clear_symbol_prices(symbol)
-                            pipeline.fetch_prices_yahoo(symbol, period=period)
-                            success_count += 1
+                            # refetch clears old rows only for symbols that returned data
+                            loaded.update(pipeline.fetch_prices_batch_yahoo(
+                                chunk, period=period, replace=refetch))
                         except Exception as e:
-                            st.error(f"❌ Failed to fetch {symbol}: {e}")
-                            fail_count += 1
+                            st.error(f"❌ Failed to fetch {', '.join(chunk)}: {e}")
+
+                        done += len(chunk)
+                        progress_bar.progress(done / len(symbols))
 
-                        progress_bar.progress((i + 1) / len(symbols))
+                    failed = [s for s in symbols if s not in loaded]
+                    success_count = len(loaded)
+                    fail_count = len(failed)
 
                     status_text.empty()
                     progress_bar.empty()
 
                     if success_count > 0:
+                        _dashboard_stats.clear()
+                        cached_query.clear()
                         st.success(f"✅ Successfully fetched {success_count} symbols!")
                     if fail_count > 0:
-                        st.warning(f"⚠️ Failed to fetch {fail_count} symbols")
+                        st.warning(f"⚠️ Failed to fetch {fail_count} symbols: {', '.join(failed)}")
                 else:
                     st.warning("⚠️ Please enter at least one symbol")
 
@@ -759,19 +1132,21 @@ elif page == "📥 Data Fetcher":
         
         if st.button("📥 Fetch Macro Data", type="primary"):
             if indicators_input:
-                indicators = [i.strip().upper() for i in indicators_input.split(',')]
+                indicators = parse_symbols(indicators_input)
                 
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                for i, indicator in enumerate(indicators):
-                    status_text.text(f"Fetching {indicator}...")
+                # Series download in parallel; each is written (and committed)
+                # on this thread as it arrives
+                fetched = pipeline.fetch_fred_many(indicators)
+                for i, (indicator, error) in enumerate(fetched):
+                    status_text.text(f"Fetched {indicator} ({i + 1}/{len(indicators)})")
                     
-                    try:
-                        pipeline.fetch_fred(indicator)
+                    if error is None:
                         st.success(f"✅ Fetched {indicator}")
-                    except Exception as e:
-                        st.error(f"❌ Failed: {e}")
+                    else:
+                        st.error(f"❌ Failed {indicator}: {error}")
                     
                     progress_bar.progress((i + 1) / len(indicators))
                 
@@ -802,7 +1177,7 @@ elif page == "📊 Query & Analysis":
         with col1:
             if st.button("📊 Sector Performance", use_container_width=True):
                 try:
-                    results = pipeline.query("""
+                    results = cached_query("""
                         SELECT 
                             s.sector,
                             COUNT(DISTINCT s.symbol) as symbol_count,
@@ -821,6 +1196,7 @@ elif page == "📊 Query & Analysis":
                         st.dataframe(results, use_container_width=True)
                         
                         # Chart
+                        import plotly.express as px
                         fig = px.bar(results, x='sector', y='symbol_count',
                                    title="Symbols per Sector")
                         st.plotly_chart(fig, use_container_width=True)
@@ -830,26 +1206,19 @@ elif page == "📊 Query & Analysis":
         with col2:
             if st.button("🔥 Top Movers (30 days)", use_container_width=True):
                 try:
-                    results = pipeline.query("""
-                        SELECT 
-                            s.symbol,
-                            s.name,
-                            MIN(p.close) as low_30d,
-                            MAX(p.close) as high_30d,
-                            ((MAX(p.close) - MIN(p.close)) / MIN(p.close) * 100) as change_pct
-                        FROM symbols s
-                        JOIN daily_prices p ON s.symbol = p.symbol
-                        WHERE p.timestamp >= date('now', '-30 days')
-                        GROUP BY s.symbol, s.name
-                        HAVING change_pct > 0
-                        ORDER BY change_pct DESC
-                        LIMIT 20
-                    """)
+                    results = cached_query(TOP_MOVERS_SQL if SQL_WINDOW_FUNCTIONS
+                                           else TOP_MOVERS_SQL_LEGACY)
                     
                     if not results.empty:
-                        df = results.copy()
-                        df['change_pct'] = df['change_pct'].apply(lambda x: f"{x:.2f}%")
-                        st.dataframe(df, use_container_width=True)
+                        st.dataframe(
+                            results,
+                            use_container_width=True,
+                            column_config={
+                                "price_30d_ago": st.column_config.NumberColumn(format="$%.2f"),
+                                "latest_price": st.column_config.NumberColumn(format="$%.2f"),
+                                "change_pct": st.column_config.NumberColumn(format="%.2f%%")
+                            }
+                        )
                 except Exception as e:
                     st.error(f"❌ Query failed: {e}")
     
@@ -858,54 +1227,40 @@ elif page == "📊 Query & Analysis":
         st.subheader("💻 Custom SQL Query")
         
         # Example queries dropdown
-        examples = {
-            "Top 10 Symbols": "SELECT * FROM symbols LIMIT 10",
-            "Recent Prices": """SELECT s.symbol, s.name, p.close, p.timestamp 
-FROM symbols s 
-JOIN daily_prices p ON s.symbol = p.symbol 
-ORDER BY p.timestamp DESC 
-LIMIT 100""",
-            "Technology Sector": """SELECT symbol, name, market_cap 
-FROM symbols 
-WHERE sector = 'Technology' 
-ORDER BY market_cap DESC 
-LIMIT 50""",
-            "Price Summary": """SELECT 
-    symbol,
-    MIN(close) as low,
-    MAX(close) as high,
-    AVG(close) as avg,
-    COUNT(*) as days
-FROM daily_prices
-GROUP BY symbol
-ORDER BY days DESC
-LIMIT 20"""
-        }
-        
-        example = st.selectbox("📚 Load Example Query", ["Custom"] + list(examples.keys()))
+        example = st.selectbox("📚 Load Example Query", ["Custom"] + list(EXAMPLE_QUERIES))
         
         if example != "Custom":
-            default_sql = examples[example]
+            default_sql = EXAMPLE_QUERIES[example]
         else:
-            default_sql = "SELECT * FROM symbols LIMIT 100"
+            default_sql = "SELECT symbol, name, sector, industry, market_cap FROM symbols LIMIT 100"
         
         sql_query = st.text_area(
             "SQL Query",
             value=default_sql,
             height=250,
-            help="Write your SQL query here"
+            help=f"Read-only; results are capped at {SQL_EDITOR_MAX_ROWS:,} rows"
         )
         
+        if re.search(r"\bselect\s+\*", sql_query, re.IGNORECASE):
+            st.caption("💡 Listing only the columns you need instead of `SELECT *` keeps results smaller and faster")
+        
         col1, col2, col3 = st.columns([1, 1, 4])
         
         with col1:
             if st.button("▶️ Execute", type="primary", use_container_width=True):
                 with st.spinner("Executing query..."):
                     try:
-                        results = pipeline.query(sql_query)
+                        # Read-only and row-capped so a stray query can't modify the
+                        # database or pull a whole table into memory. Arrow-backed
+                        # columns: ad-hoc results are often wide text
+                        results, truncated = pipeline.query_readonly(
+                            sql_query, max_rows=SQL_EDITOR_MAX_ROWS, dtype_backend='pyarrow'
+                        )
                         
                         if not results.empty:
                             st.success(f"✅ Returned {len(results):,} rows × {len(results.columns)} columns")
+                            if truncated:
+                                st.warning(f"⚠️ Showing the first {SQL_EDITOR_MAX_ROWS:,} rows; add a LIMIT or filter to narrow the query")
                             
                             # Display results
                             st.dataframe(results, use_container_width=True, height=400)
@@ -915,7 +1270,7 @@ LIMIT 20"""
                             with col1:
                                 st.download_button(
                                     "📥 Download CSV",
-                                    results.to_csv(index=False),
+                                    csv_bytes(results),
                                     "query_results.csv",
                                     "text/csv",
                                     use_container_width=True
@@ -923,7 +1278,7 @@ LIMIT 20"""
                             with col2:
                                 st.download_button(
                                     "📄 Download JSON",
-                                    results.to_json(orient='records', indent=2),
+                                    json_bytes(results),
                                     "query_results.json",
                                     "application/json",
                                     use_container_width=True
@@ -1019,80 +1374,131 @@ LIMIT 20"""
                 show_grid = st.checkbox("Show Grid", value=True)
 
         if st.button("📊 Analyze", type="primary"):
-            # Build date filter query
-            date_filter = ""
+            import plotly.graph_objects as go
+
+            # Resolve the requested date bounds as ISO strings
+            range_start = range_end = None
             if time_range != "All Data" and time_range != "Custom":
-                days_map = {
-                    "1 Month": 30,
-                    "3 Months": 90,
-                    "6 Months": 180,
-                    "1 Year": 365,
-                    "2 Years": 730,
-                    "5 Years": 1825
-                }
-                days = days_map[time_range]
-                date_filter = f"AND timestamp >= date('now', '-{days} days')"
+                days = TIME_RANGE_DAYS[time_range]
+                range_start = (datetime.now().date() - timedelta(days=days)).isoformat()
             elif time_range == "Custom" and start_date and end_date:
-                date_filter = f"AND timestamp BETWEEN '{start_date}' AND '{end_date}'"
+                range_start, range_end = start_date.isoformat(), end_date.isoformat()
+
+            # Cheap index probe: skip the history query when the symbol has no
+            # rows in range, and tighten the start bound to its first row.
+            # The bound is shared by both symbols, so a comparison symbol
+            # with earlier history keeps the requested start.
+            probe = cached_query("""
+                SELECT MIN(timestamp) AS first_ts, MAX(timestamp) AS last_ts, COUNT(*) AS n
+                FROM daily_prices
+                WHERE symbol = ?
+            """, (symbol,)).iloc[0]
+            has_rows = bool(probe['n']) and not (
+                (range_start and range_start > probe['last_ts'])
+                or (range_end and range_end < probe['first_ts'][:10])
+            )
+            if has_rows and range_start and not comparison_symbol:
+                range_start = max(range_start, probe['first_ts'])
+
+            # Build date filter query (bound parameters keep the cache key stable)
+            date_filter = ""
+            date_params = []
+            if range_start and range_end:
+                date_filter = "AND timestamp BETWEEN ? AND ?"
+                date_params = [range_start, range_end]
+            elif range_start:
+                date_filter = "AND timestamp >= ?"
+                date_params = [range_start]
+
+            # Moving averages come from SQL window functions; the ROW_NUMBER
+            # guard leaves the first N-1 rows NULL like pandas rolling() does
+            ma_windows = [n for n, shown in ((20, show_ma20), (50, show_ma50),
+                                             (100, show_ma100), (200, show_ma200)) if shown]
+            sql_windows = ma_windows if SQL_WINDOW_FUNCTIONS else []
+            ma_columns = "".join(
+                f""",
+                    CASE WHEN ROW_NUMBER() OVER w >= {n}
+                         THEN AVG(close) OVER (w ROWS {n - 1} PRECEDING) END AS MA{n}"""
+                for n in sql_windows
+            )
+            window_clause = "WINDOW w AS (PARTITION BY symbol ORDER BY timestamp)" if sql_windows else ""
 
-            # Get price history
+            # Get price history; the comparison symbol comes back in the same query
+            wanted = [symbol, comparison_symbol] if comparison_symbol else [symbol]
             query = f"""
-                SELECT timestamp, open, high, low, close, volume
+                SELECT symbol, timestamp, open, high, low, close, volume{ma_columns}
                 FROM daily_prices
-                WHERE symbol = ?
+                WHERE symbol IN ({",".join("?" * len(wanted))})
                 {date_filter}
+                {window_clause}
                 ORDER BY timestamp ASC
             """
 
-            results = pipeline.query(query, [symbol])
-
-            if not results.empty:
-                df = results.copy()
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
+            series = {}
+            if has_rows:
+                # cached_query hands back a fresh frame, so it can be modified in place
+                results = cached_query(query, (*wanted, *date_params))
+                results['timestamp'] = pd.to_datetime(results['timestamp'], format='ISO8601')
+                if comparison_symbol:
+                    # Normalize to percentage change for comparison
+                    first_close = results.groupby('symbol')['close'].transform('first')
+                    results['normalized'] = (results['close'] / first_close - 1) * 100
+                series = dict(tuple(results.groupby('symbol', sort=False)))
+
+            if symbol in series:
+                df = series[symbol]
+                if not SQL_WINDOW_FUNCTIONS and ma_windows:
+                    for n, ma in rolling_means(df['close'], ma_windows).items():
+                        df[f'MA{n}'] = ma
+
+                # Thin long histories so the browser isn't sent every bar
+                plot_df = df
+                if len(df) > PLOT_DOWNSAMPLE_ABOVE:
+                    if chart_type in ("Candlestick", "OHLC Bar"):
+                        plot_df = bucket_ohlc(df, PLOT_MAX_POINTS)
+                    else:
+                        picked = lttb_indices(df['close'], PLOT_MAX_POINTS)
+                        plot_df = df.iloc[picked]
+                        if 'volume' in df.columns:
+                            # Volume bars share the line's x points and keep the total
+                            plot_df = plot_df.assign(volume=bucket_volume(df['volume'], picked))
 
-                # Calculate moving averages if requested
-                if show_ma20:
-                    df['MA20'] = df['close'].rolling(window=20).mean()
-                if show_ma50:
-                    df['MA50'] = df['close'].rolling(window=50).mean()
-                if show_ma100:
-                    df['MA100'] = df['close'].rolling(window=100).mean()
-                if show_ma200:
-                    df['MA200'] = df['close'].rolling(window=200).mean()
+                # WebGL line traces for very long histories (candles have no GL variant)
+                scatter = go.Scattergl if len(df) > WEBGL_ABOVE else go.Scatter
 
                 # Create figure based on chart type
                 if chart_type == "Candlestick":
                     fig = go.Figure(data=[go.Candlestick(
-                        x=df['timestamp'],
-                        open=df['open'],
-                        high=df['high'],
-                        low=df['low'],
-                        close=df['close'],
+                        x=plot_df['timestamp'],
+                        open=plot_df['open'],
+                        high=plot_df['high'],
+                        low=plot_df['low'],
+                        close=plot_df['close'],
                         name=symbol
                     )])
                 elif chart_type == "OHLC Bar":
                     fig = go.Figure(data=[go.Ohlc(
-                        x=df['timestamp'],
-                        open=df['open'],
-                        high=df['high'],
-                        low=df['low'],
-                        close=df['close'],
+                        x=plot_df['timestamp'],
+                        open=plot_df['open'],
+                        high=plot_df['high'],
+                        low=plot_df['low'],
+                        close=plot_df['close'],
                         name=symbol
                     )])
                 elif chart_type == "Area":
                     fig = go.Figure()
-                    fig.add_trace(go.Scatter(
-                        x=df['timestamp'],
-                        y=df['close'],
+                    fig.add_trace(scatter(
+                        x=plot_df['timestamp'],
+                        y=plot_df['close'],
                         fill='tozeroy',
                         name=symbol,
                         line=dict(color='rgb(0, 176, 246)', width=2)
                     ))
                 else:  # Line chart
                     fig = go.Figure()
-                    fig.add_trace(go.Scatter(
-                        x=df['timestamp'],
-                        y=df['close'],
+                    fig.add_trace(scatter(
+                        x=plot_df['timestamp'],
+                        y=plot_df['close'],
                         mode='lines',
                         name=symbol,
                         line=dict(width=2)
@@ -1100,38 +1506,34 @@ LIMIT 20"""
 
                 # Add moving averages
                 if show_ma20:
-                    fig.add_trace(go.Scatter(
-                        x=df['timestamp'], y=df['MA20'],
+                    fig.add_trace(scatter(
+                        x=plot_df['timestamp'], y=plot_df['MA20'],
                         name='MA20', line=dict(dash='dash', width=1)
                     ))
                 if show_ma50:
-                    fig.add_trace(go.Scatter(
-                        x=df['timestamp'], y=df['MA50'],
+                    fig.add_trace(scatter(
+                        x=plot_df['timestamp'], y=plot_df['MA50'],
                         name='MA50', line=dict(dash='dash', width=1)
                     ))
                 if show_ma100:
-                    fig.add_trace(go.Scatter(
-                        x=df['timestamp'], y=df['MA100'],
+                    fig.add_trace(scatter(
+                        x=plot_df['timestamp'], y=plot_df['MA100'],
                         name='MA100', line=dict(dash='dot', width=1)
                     ))
                 if show_ma200:
-                    fig.add_trace(go.Scatter(
-                        x=df['timestamp'], y=df['MA200'],
+                    fig.add_trace(scatter(
+                        x=plot_df['timestamp'], y=plot_df['MA200'],
                         name='MA200', line=dict(dash='dot', width=1)
                     ))
 
                 # Add comparison symbol if provided
                 if comparison_symbol:
-                    comp_results = pipeline.query(query, [comparison_symbol])
-                    if not comp_results.empty:
-                        comp_df = comp_results.copy()
-                        comp_df['timestamp'] = pd.to_datetime(comp_df['timestamp'])
-
-                        # Normalize to percentage change for comparison
-                        df['normalized'] = (df['close'] / df['close'].iloc[0] - 1) * 100
-                        comp_df['normalized'] = (comp_df['close'] / comp_df['close'].iloc[0] - 1) * 100
+                    comp_df = series.get(comparison_symbol)
+                    if comp_df is not None:
+                        if len(comp_df) > PLOT_DOWNSAMPLE_ABOVE:
+                            comp_df = comp_df.iloc[lttb_indices(comp_df['normalized'], PLOT_MAX_POINTS)]
 
-                        fig.add_trace(go.Scatter(
+                        fig.add_trace(scatter(
                             x=comp_df['timestamp'],
                             y=comp_df['normalized'],
                             mode='lines',
@@ -1158,7 +1560,8 @@ LIMIT 20"""
                     xaxis=dict(showgrid=show_grid),
                     yaxis=dict(showgrid=show_grid),
                     hovermode='x unified',
-                    height=600
+                    height=600,
+                    uirevision='constant'  # keep zoom/pan across Streamlit reruns
                 )
 
                 st.plotly_chart(fig, use_container_width=True)
@@ -1167,8 +1570,8 @@ LIMIT 20"""
                 if show_volume and 'volume' in df.columns:
                     vol_fig = go.Figure()
                     vol_fig.add_trace(go.Bar(
-                        x=df['timestamp'],
-                        y=df['volume'],
+                        x=plot_df['timestamp'],
+                        y=plot_df['volume'],
                         name='Volume',
                         marker_color='lightblue'
                     ))
@@ -1184,21 +1587,25 @@ LIMIT 20"""
                 st.markdown("---")
                 st.subheader("📊 Statistics")
 
+                # One pass over plain arrays; nan-aware reductions match pandas' skipna
+                close = df['close'].to_numpy(dtype=float)
+                daily_returns = np.diff(close) / close[:-1]
+
                 col1, col2, col3, col4, col5 = st.columns(5)
 
                 with col1:
-                    st.metric("Current", f"${df['close'].iloc[-1]:.2f}")
+                    st.metric("Current", f"${close[-1]:.2f}")
 
                 with col2:
-                    period_high = df['close'].max()
+                    period_high = np.nanmax(close)
                     st.metric("Period High", f"${period_high:.2f}")
 
                 with col3:
-                    period_low = df['close'].min()
+                    period_low = np.nanmin(close)
                     st.metric("Period Low", f"${period_low:.2f}")
 
                 with col4:
-                    change = ((df['close'].iloc[-1] - df['close'].iloc[0]) / df['close'].iloc[0] * 100)
+                    change = (close[-1] - close[0]) / close[0] * 100
                     st.metric("Change", f"{change:+.2f}%")
 
                 with col5:
@@ -1211,20 +1618,24 @@ LIMIT 20"""
 
                     with col1:
                         st.write("**Price Stats**")
-                        st.write(f"Mean: ${df['close'].mean():.2f}")
-                        st.write(f"Median: ${df['close'].median():.2f}")
-                        st.write(f"Std Dev: ${df['close'].std():.2f}")
+                        st.write(f"Mean: ${np.nanmean(close):.2f}")
+                        st.write(f"Median: ${np.nanmedian(close):.2f}")
+                        st.write(f"Std Dev: ${np.nanstd(close, ddof=1):.2f}")
 
                     with col2:
                         st.write("**Returns**")
-                        daily_returns = df['close'].pct_change()
-                        st.write(f"Best Day: {daily_returns.max()*100:.2f}%")
-                        st.write(f"Worst Day: {daily_returns.min()*100:.2f}%")
-                        st.write(f"Avg Daily: {daily_returns.mean()*100:.2f}%")
+                        if daily_returns.size:
+                            st.write(f"Best Day: {np.nanmax(daily_returns)*100:.2f}%")
+                            st.write(f"Worst Day: {np.nanmin(daily_returns)*100:.2f}%")
+                            st.write(f"Avg Daily: {np.nanmean(daily_returns)*100:.2f}%")
+                        else:
+                            st.write("Not enough data")
 
                     with col3:
                         st.write("**Volatility**")
-                        volatility = daily_returns.std() * (252 ** 0.5) * 100  # Annualized
+                        volatility = np.nan
+                        if daily_returns.size > 1:
+                            volatility = np.nanstd(daily_returns, ddof=1) * (252 ** 0.5) * 100  # Annualized
                         st.write(f"Annual: {volatility:.2f}%")
                         st.write(f"Data Points: {len(df)}")
                         st.write(f"Date Range: {len(df)} days")
@@ -1232,7 +1643,7 @@ LIMIT 20"""
                 # Download option
                 st.download_button(
                     "📥 Download Data as CSV",
-                    df.to_csv(index=False),
+                    csv_bytes(df),
                     f"{symbol}_data.csv",
                     "text/csv"
                 )
@@ -1255,12 +1666,14 @@ elif page == "⭐ Watchlists":
     with col1:
         st.subheader("📋 My Watchlists")
         
-        # Get existing watchlists
-        try:
-            watchlists = pipeline.query("SELECT DISTINCT name FROM watchlists ORDER BY name")
-            watchlist_names = watchlists['name'].tolist() if not watchlists.empty else []
-        except:
-            watchlist_names = []
+        # Get existing watchlists (kept per session; reset on create/delete)
+        if 'watchlist_names' not in st.session_state:
+            try:
+                watchlists = pipeline.query("SELECT DISTINCT name FROM watchlists ORDER BY name")
+                st.session_state.watchlist_names = watchlists['name'].tolist()
+            except:
+                st.session_state.watchlist_names = []
+        watchlist_names = st.session_state.watchlist_names
         
         if watchlist_names:
             selected = st.selectbox("Select Watchlist", watchlist_names)
@@ -1285,9 +1698,11 @@ elif page == "⭐ Watchlists":
             
             if submitted:
                 if new_name and new_symbols:
-                    symbols = [s.strip().upper() for s in new_symbols.split(',')]
+                    symbols = parse_symbols(new_symbols)
                     try:
                         pipeline.create_watchlist(new_name, symbols)
+                        st.session_state.pop('watchlist_names', None)
+                        cached_query.clear()
                         st.success(f"✅ Created watchlist: {new_name}")
                         st.rerun()
                     except Exception as e:
@@ -1304,32 +1719,34 @@ elif page == "⭐ Watchlists":
                 symbols = pipeline.get_watchlist(selected)
                 
                 if symbols:
-                    # Get latest prices
-                    symbol_list = "','".join(symbols)
-                    results = pipeline.query(f"""
+                    # Get latest prices: one MAX(timestamp) seek per watchlist
+                    # symbol on the (symbol, timestamp) key, bound as parameters
+                    placeholders = ",".join("?" * len(symbols))
+                    results = cached_query(f"""
+                        WITH latest AS (
+                            SELECT symbol, MAX(timestamp) AS max_date
+                            FROM daily_prices
+                            WHERE symbol IN ({placeholders})
+                            GROUP BY symbol
+                        )
                         SELECT 
                             s.symbol,
                             s.name,
                             s.sector,
                             p.close as price,
                             p.volume,
-                            p.timestamp as last_update
+                            DATE(p.timestamp) as last_update
                         FROM symbols s
-                        LEFT JOIN daily_prices p ON s.symbol = p.symbol
-                        WHERE s.symbol IN ('{symbol_list}')
-                        AND (p.timestamp = (SELECT MAX(timestamp) FROM daily_prices WHERE symbol = s.symbol) 
-                             OR p.timestamp IS NULL)
+                        LEFT JOIN latest l ON l.symbol = s.symbol
+                        LEFT JOIN daily_prices p ON p.symbol = l.symbol AND p.timestamp = l.max_date
+                        WHERE s.symbol IN ({placeholders})
                         ORDER BY s.symbol
-                    """)
+                    """, tuple(symbols) * 2, dtype_backend='pyarrow')
                     
                     if not results.empty:
-                        df = results.copy()
-                        df['price'] = df['price'].apply(lambda x: f"${x:.2f}" if pd.notna(x) else "N/A")
-                        df['volume'] = df['volume'].apply(lambda x: format_number(x) if pd.notna(x) else "N/A")
-                        df['last_update'] = pd.to_datetime(df['last_update']).dt.strftime('%Y-%m-%d')
-                        
+                        # Numeric columns stay numeric; the browser applies the formats
                         st.dataframe(
-                            df,
+                            results,
                             use_container_width=True,
                             height=500,
                             hide_index=True,
@@ -1337,8 +1754,8 @@ elif page == "⭐ Watchlists":
                                 "symbol": st.column_config.TextColumn("Symbol", width="small"),
                                 "name": st.column_config.TextColumn("Name", width="medium"),
                                 "sector": st.column_config.TextColumn("Sector", width="medium"),
-                                "price": st.column_config.TextColumn("Price", width="small"),
-                                "volume": st.column_config.TextColumn("Volume", width="small"),
+                                "price": st.column_config.NumberColumn("Price", width="small", format="$%.2f"),
+                                "volume": st.column_config.NumberColumn("Volume", width="small", format="compact"),
                                 "last_update": st.column_config.TextColumn("Updated", width="small")
                             }
                         )
@@ -1351,6 +1768,8 @@ elif page == "⭐ Watchlists":
                                 st.info(f"Fetching {len(symbols)} symbols from Yahoo Finance...")
                                 try:
                                     pipeline.fetch_prices_batch_yahoo(symbols, period="1y")
+                                    _dashboard_stats.clear()
+                                    cached_query.clear()
                                     st.success(f"✅ Successfully fetched {len(symbols)} symbols!")
                                     st.rerun()
                                 except Exception as e:
@@ -1359,7 +1778,7 @@ elif page == "⭐ Watchlists":
                         with col2:
                             st.download_button(
                                 "📥 Export CSV",
-                                results.to_csv(index=False),
+                                csv_bytes(results),
                                 f"{selected}_watchlist.csv",
                                 "text/csv",
                                 use_container_width=True
@@ -1368,7 +1787,9 @@ elif page == "⭐ Watchlists":
                         with col3:
                             if st.button("🗑️ Delete Watchlist", use_container_width=True):
                                 try:
-                                    pipeline.query("DELETE FROM watchlists WHERE name = ?", [selected])
+                                    pipeline.delete_watchlist(selected)
+                                    st.session_state.pop('watchlist_names', None)
+                                    cached_query.clear()
                                     st.success(f"✅ Deleted watchlist: {selected}")
                                     st.rerun()
                                 except Exception as e:
@@ -1426,25 +1847,21 @@ elif page == "⚙️ Settings":
         st.subheader("📊 Recent API Calls")
 
         try:
-            recent_calls = pipeline.query("""
-                SELECT source, COUNT(*) as calls, MAX(timestamp) as last_call
-                FROM api_calls
-                WHERE timestamp >= datetime('now', '-24 hours')
-                GROUP BY source
-                ORDER BY calls DESC
-            """)
-
-            if not recent_calls.empty:
+            recent_calls = _recent_api_calls()
+
+            if recent_calls:
                 st.dataframe(recent_calls, use_container_width=True, hide_index=True)
             else:
                 st.info("No API calls in the last 24 hours")
-        except:
-            st.error("Error loading API call history")
+        except Exception as e:
+            st.error(f"Error loading API call history: {e}")
 
         # Reset button
         if st.button("🔄 Clear API Call History", type="secondary"):
             try:
-                pipeline.query("DELETE FROM api_calls")
+                pipeline.clear_api_calls()
+                _recent_api_calls.clear()
+                _dashboard_stats.clear()
                 st.success("✅ API call history cleared")
                 st.rerun()
             except Exception as e:
@@ -1455,9 +1872,8 @@ elif page == "⚙️ Settings":
         st.subheader("💾 Database Management")
         
         try:
-            db_path = Path(pipeline.db_path)
-            if db_path.exists():
-                size_mb = db_path.stat().st_size / (1024 * 1024)
+            size_mb = _db_size_mb()
+            if size_mb is not None:
                 
                 col1, col2, col3 = st.columns(3)
                 
@@ -1466,12 +1882,10 @@ elif page == "⚙️ Settings":
                 
                 with col2:
                     # Count tables
-                    tables = pipeline.query("SELECT COUNT(*) as count FROM sqlite_master WHERE type='table'")
-                    table_count = tables['count'].iloc[0] if not tables.empty else 0
-                    st.metric("📋 Tables", table_count)
+                    st.metric("📋 Tables", len(_table_stats(pipeline.schema_version())))
                 
                 with col3:
-                    st.metric("📂 Location", db_path.name)
+                    st.metric("📂 Location", DB_NAME)
                 
                 st.info(f"**Full Path:** `{pipeline.db_path}`")
         except Exception as e:
@@ -1485,33 +1899,105 @@ elif page == "⚙️ Settings":
         
         with col1:
             if st.button("🗜️ Vacuum (Optimize)", use_container_width=True, type="primary"):
-                with st.spinner("Optimizing database..."):
-                    try:
-                        pipeline.vacuum()
-                        st.success("✅ Database optimized!")
-                        st.info("💡 Vacuum reclaims unused space and defragments the database")
-                    except Exception as e:
-                        st.error(f"❌ Optimization failed: {e}")
+                # A full VACUUM rewrites the whole file; skip it when there is
+                # little free space for it to reclaim
+                ratio = free_page_ratio()
+                if ratio < VACUUM_MIN_FREE_RATIO:
+                    st.info(f"💡 Skipped: only {ratio:.1%} of pages are free")
+                else:
+                    with st.spinner("Optimizing database..."):
+                        try:
+                            pipeline.vacuum()
+                            _db_size_mb.clear()
+                            st.success("✅ Database optimized!")
+                            st.info("💡 Vacuum reclaims unused space and defragments the database")
+                        except Exception as e:
+                            st.error(f"❌ Optimization failed: {e}")
+            
+            if st.button("♻️ Incremental Vacuum", use_container_width=True):
+                try:
+                    if pipeline.incremental_vacuum():
+                        _db_size_mb.clear()
+                        st.success("✅ Free pages released")
+                    else:
+                        st.info("💡 Run a full Vacuum once to enable incremental vacuum")
+                except Exception as e:
+                    st.error(f"❌ Incremental vacuum failed: {e}")
         
         with col2:
             if st.button("💾 Create Backup", use_container_width=True, type="primary"):
                 with st.spinner("Creating backup..."):
                     try:
                         backup_path = pipeline.backup()
+                        backup_mb = Path(backup_path).stat().st_size / (1024 * 1024)
                         st.success(f"✅ Backup created!")
-                        st.info(f"📁 {Path(backup_path).name}")
+                        st.info(f"📁 {Path(backup_path).name} — {backup_mb:.2f} MB "
+                                f"(database: {pipeline.db_size() / (1024 * 1024):.2f} MB)")
                     except Exception as e:
                         st.error(f"❌ Backup failed: {e}")
         
         with col3:
-            if st.button("📊 Analyze Schema", use_container_width=True, type="primary"):
-                with st.spinner("Analyzing database..."):
-                    try:
-                        pipeline.query("ANALYZE")
-                        st.success("✅ Database analyzed!")
-                        st.info("💡 ANALYZE updates query planner statistics")
-                    except Exception as e:
-                        st.error(f"❌ Analysis failed: {e}")
+            # ANALYZE and Full Maintenance run on a worker thread (with their
+            # own connection) so the page stays usable; db_job_progress()
+            # polls them until done
+            db_busy = 'db_job' in st.session_state
+            if st.button("📊 Analyze Schema", use_container_width=True, type="primary",
+                         disabled=db_busy):
+                st.session_state.db_job = (
+                    db_executor().submit(pipeline.optimize, own_connection=True),
+                    "Analysis", time.perf_counter()
+                )
+                db_busy = True
+            
+            if db_busy:
+                db_job_progress()
+            
+            db_job_result = st.session_state.pop('db_job_result', None)
+            if db_job_result:
+                label, error, result, elapsed = db_job_result
+                if error is not None:
+                    st.error(f"❌ {label} failed: {error}")
+                elif label.startswith("Maintenance"):
+                    _db_size_mb.clear()
+                    st.success(f"✅ {label} finished in {elapsed:.2f}s")
+                    st.info(f"📁 {Path(result).name}")
+                elif result:
+                    st.success(f"✅ {label} finished in {elapsed:.2f}s")
+                    if label == "Analysis":
+                        st.info("💡 Only tables with stale planner statistics are re-analyzed")
+                else:
+                    st.info(f"💡 {label}: planner statistics already up to date, nothing re-analyzed")
+        
+        # Vacuum, statistics and backup in one go, in the recommended order
+        # (VACUUM before ANALYZE, backup of the compacted file last)
+        if st.button("🧰 Full Maintenance", use_container_width=True, disabled=db_busy):
+            # A full VACUUM only when there is enough free space to reclaim
+            ratio = free_page_ratio()
+            vacuum = ratio >= VACUUM_MIN_FREE_RATIO
+            st.session_state.db_job = (
+                db_executor().submit(pipeline.maintenance, vacuum=vacuum),
+                "Maintenance" if vacuum else f"Maintenance (vacuum skipped, {ratio:.1%} of pages free)",
+                time.perf_counter()
+            )
+            st.rerun()
+        
+        with st.expander("🔬 Force Full ANALYZE"):
+            st.caption("Rescans every table and index. Rarely needed, and slow on large databases.")
+            sample_rows = st.select_slider(
+                "Rows sampled per index",
+                options=[100, 400, 1000, 10000, "Unlimited"],
+                value=400
+            )
+            st.caption("A few hundred rows per index gives the planner good-enough statistics in "
+                       "bounded time; Unlimited is exact but reads every index in full.")
+            if st.button("Run Full ANALYZE", disabled=db_busy):
+                analysis_limit = 0 if sample_rows == "Unlimited" else sample_rows
+                st.session_state.db_job = (
+                    db_executor().submit(pipeline.optimize, full=True, own_connection=True,
+                                         analysis_limit=analysis_limit),
+                    "Full ANALYZE", time.perf_counter()
+                )
+                st.rerun()
         
         st.markdown("---")
         
@@ -1519,17 +2005,9 @@ elif page == "⚙️ Settings":
         st.subheader("📊 Table Statistics")
         
         try:
-            table_stats = pipeline.query("""
-                SELECT 
-                    name as table_name,
-                    (SELECT COUNT(*) FROM sqlite_master WHERE type='index' AND tbl_name=m.name) as index_count
-                FROM sqlite_master m
-                WHERE type='table'
-                AND name NOT LIKE 'sqlite_%'
-                ORDER BY name
-            """)
+            table_stats = _table_stats(pipeline.schema_version())
             
-            if not table_stats.empty:
+            if table_stats:
                 st.dataframe(table_stats, use_container_width=True, hide_index=True)
         except Exception as e:
             st.error(f"Error loading table stats: {e}")
@@ -1552,45 +2030,10 @@ elif page == "⚙️ Settings":
         """)
         
         # Color preview
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.markdown("""
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                        padding: 2rem; border-radius: 8px; text-align: center; color: white; font-weight: bold;">
-                Primary
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown("""
-            <div style="background: #2ecc71; 
-                        padding: 2rem; border-radius: 8px; text-align: center; color: white; font-weight: bold;">
-                Success
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown("""
-            <div style="background: #e74c3c; 
-                        padding: 2rem; border-radius: 8px; text-align: center; color: white; font-weight: bold;">
-                Error
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col4:
-            st.markdown("""
-            <div style="background: #f39c12; 
-                        padding: 2rem; border-radius: 8px; text-align: center; color: white; font-weight: bold;">
-                Warning
-            </div>
-            """, unsafe_allow_html=True)
+        st.markdown(COLOR_SWATCHES_HTML, unsafe_allow_html=True)
 
 # ============================================================================
 # FOOTER
 # ============================================================================
 
-st.sidebar.markdown("---")
-st.sidebar.caption("💡 **Pro Tip:** Bookmark frequently used queries")
-st.sidebar.caption("📖 [View Documentation](docs/QUICKSTART.md)")
-st.sidebar.caption("🐛 [Report Issues](https://github.com/yourusername/FinancePipeline)")
+st.sidebar.caption(SIDEBAR_FOOTER)
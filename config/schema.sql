@@ -1,6 +1,10 @@
 -- Financial Data Pipeline Schema
 -- Door 865: Financial Data Pipeline - SQLite Edition
 
+-- Must precede the first table and journal_mode=WAL; lets free pages be
+-- released without a full VACUUM
+PRAGMA auto_vacuum = INCREMENTAL;
+
 -- Symbol master table (from FinanceDatabase)
 CREATE TABLE IF NOT EXISTS symbols (
     symbol TEXT PRIMARY KEY,
@@ -145,12 +149,13 @@ CREATE INDEX IF NOT EXISTS idx_prices_source ON daily_prices(source);
 CREATE INDEX IF NOT EXISTS idx_symbols_sector ON symbols(sector);
 CREATE INDEX IF NOT EXISTS idx_symbols_exchange ON symbols(exchange);
 CREATE INDEX IF NOT EXISTS idx_symbols_country ON symbols(country);
+CREATE INDEX IF NOT EXISTS idx_symbols_asset_class ON symbols(asset_class);
 CREATE INDEX IF NOT EXISTS idx_macro_indicator ON macro_data(indicator);
 CREATE INDEX IF NOT EXISTS idx_macro_date ON macro_data(date);
 CREATE INDEX IF NOT EXISTS idx_news_symbol ON news(symbol);
 CREATE INDEX IF NOT EXISTS idx_news_published ON news(published_at);
 CREATE INDEX IF NOT EXISTS idx_api_calls_source ON api_calls(source);
-CREATE INDEX IF NOT EXISTS idx_api_calls_timestamp ON api_calls(timestamp);
+CREATE INDEX IF NOT EXISTS idx_api_calls_ts_source ON api_calls(timestamp, source);  -- covers the per-source recent-call summary
 CREATE INDEX IF NOT EXISTS idx_fundamentals_symbol ON fundamentals(symbol);
 CREATE INDEX IF NOT EXISTS idx_fundamentals_period ON fundamentals(period_end);
 
@@ -17,17 +17,16 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src.pipeline import FinancePipeline
+import numpy as np
 import pandas as pd
 
 
-def example_sector_analysis():
+def example_sector_analysis(pipeline):
     """Analyze sector performance and export to CSV"""
     print("\n" + "=" * 60)
     print("Example 1: Sector Performance Analysis")
     print("=" * 60)
     
-    pipeline = FinancePipeline()
-    
     # Get sector performance
     sectors = pipeline.query("""
         SELECT 
@@ -55,14 +54,12 @@ def example_sector_analysis():
     print(f"\n✓ Exported to {output_path}")
 
 
-def example_price_momentum():
+def example_price_momentum(pipeline):
     """Find stocks with strong recent momentum"""
     print("\n" + "=" * 60)
     print("Example 2: Price Momentum Analysis")
     print("=" * 60)
     
-    pipeline = FinancePipeline()
-    
     # Calculate 30-day momentum
     momentum = pipeline.query("""
         WITH price_comparison AS (
@@ -97,30 +94,39 @@ def example_price_momentum():
               f"(${row['price_30d_ago']:.2f} → ${row['current_price']:.2f})")
 
 
-def example_macro_correlation():
+def example_macro_correlation(pipeline):
     """Correlate market performance with unemployment rate"""
     print("\n" + "=" * 60)
     print("Example 3: Market vs Unemployment Correlation")
     print("=" * 60)
     
-    pipeline = FinancePipeline()
-    
-    # Get market average and unemployment by month
+    # Get market average and unemployment by month: both sides are reduced
+    # to monthly grain first, then joined on the month. Dates are stored as
+    # ISO text, so the month key is just the 'YYYY-MM' prefix (no strftime).
+    # LEFT JOIN keeps months whose UNRATE is not released yet (usually the
+    # current one); their rate is NULL
     correlation = pipeline.query("""
-        SELECT 
-            strftime('%Y-%m', p.timestamp) as month,
-            AVG(p.close) as market_avg,
-            (SELECT value 
-             FROM macro_data 
-             WHERE indicator = 'UNRATE' 
-             AND date <= p.timestamp 
-             ORDER BY date DESC 
-             LIMIT 1) as unemployment_rate
-        FROM daily_prices p
-        WHERE p.timestamp >= date('now', '-365 days')
-        GROUP BY strftime('%Y-%m', p.timestamp)
-        HAVING unemployment_rate IS NOT NULL
-        ORDER BY month DESC
+        WITH monthly_market AS (
+            SELECT 
+                substr(timestamp, 1, 7) as month,
+                AVG(close) as market_avg
+            FROM daily_prices
+            WHERE timestamp >= date('now', '-365 days')
+            GROUP BY month
+        ),
+        monthly_unrate AS (
+            SELECT 
+                substr(date, 1, 7) as month,
+                AVG(value) as unemployment_rate
+            FROM macro_data
+            WHERE indicator = 'UNRATE'
+              AND date >= date('now', '-365 days', 'start of month')
+            GROUP BY month
+        )
+        SELECT m.month, m.market_avg, u.unemployment_rate
+        FROM monthly_market m
+        LEFT JOIN monthly_unrate u ON u.month = m.month
+        ORDER BY m.month DESC
     """)
     
     if len(correlation) > 0:
@@ -129,11 +135,19 @@ def example_macro_correlation():
         print("-" * 40)
         
         for _, row in correlation.head(12).iterrows():
-            print(f"{row['month']:10} ${row['market_avg']:>11.2f} {row['unemployment_rate']:>11.1f}%")
+            rate = row['unemployment_rate']
+            rate_text = f"{rate:>11.1f}%" if pd.notna(rate) else f"{'n/a':>12}"
+            print(f"{row['month']:10} ${row['market_avg']:>11.2f} {rate_text}")
         
-        # Simple correlation
-        if len(correlation) >= 2:
-            corr = correlation[['market_avg', 'unemployment_rate']].corr().iloc[0, 1]
+        # Simple correlation, over the months that have a rate
+        paired = correlation.dropna(subset=['unemployment_rate'])
+        if len(paired) >= 2:
+            # Pearson r from centred arrays: two dot products, no DataFrame.corr()
+            x = paired['market_avg'].to_numpy(dtype=float)
+            y = paired['unemployment_rate'].to_numpy(dtype=float)
+            dx = x - x.mean()
+            dy = y - y.mean()
+            corr = (dx @ dy) / np.sqrt((dx @ dx) * (dy @ dy))
             print(f"\nCorrelation: {corr:.3f}")
             if abs(corr) > 0.5:
                 direction = "negative" if corr < 0 else "positive"
@@ -142,14 +156,12 @@ def example_macro_correlation():
         print("No macro data available. Run: python scripts/fetch_macro.py")
 
 
-def example_watchlist_tracking():
+def example_watchlist_tracking(pipeline):
     """Track a custom watchlist"""
     print("\n" + "=" * 60)
     print("Example 4: Custom Watchlist Tracking")
     print("=" * 60)
     
-    pipeline = FinancePipeline()
-    
     # Create or use existing watchlist
     watchlist_name = "tech_giants"
     symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META']
@@ -160,27 +172,31 @@ def example_watchlist_tracking():
     except:
         print(f"Using existing watchlist: {watchlist_name}")
     
-    # Get current status
+    # Get current status: latest price looked up only for the watchlist's
+    # own symbols, on the (symbol, timestamp) primary key
     status = pipeline.query("""
+        WITH members AS (
+            SELECT ws.symbol
+            FROM watchlist_symbols ws
+            JOIN watchlists w ON ws.watchlist_id = w.id
+            WHERE w.name = ?
+        ),
+        latest AS (
+            SELECT symbol, MAX(timestamp) as max_date
+            FROM daily_prices
+            WHERE symbol IN (SELECT symbol FROM members)
+            GROUP BY symbol
+        )
         SELECT 
             s.symbol,
             s.name,
             p.close as last_price,
             p.volume as last_volume,
             p.timestamp as last_update
-        FROM watchlist_symbols ws
-        JOIN watchlists w ON ws.watchlist_id = w.id
-        JOIN symbols s ON ws.symbol = s.symbol
-        LEFT JOIN (
-            SELECT symbol, close, volume, timestamp
-            FROM daily_prices
-            WHERE (symbol, timestamp) IN (
-                SELECT symbol, MAX(timestamp)
-                FROM daily_prices
-                GROUP BY symbol
-            )
-        ) p ON s.symbol = p.symbol
-        WHERE w.name = ?
+        FROM members m
+        JOIN symbols s ON m.symbol = s.symbol
+        LEFT JOIN latest l ON l.symbol = m.symbol
+        LEFT JOIN daily_prices p ON p.symbol = l.symbol AND p.timestamp = l.max_date
         ORDER BY s.symbol
     """, (watchlist_name,))
     
@@ -194,14 +210,12 @@ def example_watchlist_tracking():
         print(f"{row['symbol']:6} {row['name'][:30]:30} {price:>10} {volume:>15}")
 
 
-def example_database_stats():
+def example_database_stats(pipeline):
     """Show database statistics"""
     print("\n" + "=" * 60)
     print("Example 5: Database Statistics")
     print("=" * 60)
     
-    pipeline = FinancePipeline()
-    
     # Symbol count by asset class
     symbols = pipeline.query("""
         SELECT asset_class, COUNT(*) as count
@@ -255,13 +269,16 @@ def main():
         print("Run setup first: python setup.py")
         return 1
     
+    # One pipeline (and SQLite connection, with its page cache) for every example
+    pipeline = FinancePipeline()
+    
     try:
         # Run examples
-        example_database_stats()
-        example_sector_analysis()
-        example_price_momentum()
-        example_watchlist_tracking()
-        example_macro_correlation()
+        example_database_stats(pipeline)
+        example_sector_analysis(pipeline)
+        example_price_momentum(pipeline)
+        example_watchlist_tracking(pipeline)
+        example_macro_correlation(pipeline)
         
         print("\n" + "=" * 60)
         print("Examples complete!")
@@ -278,6 +295,8 @@ def main():
         print("  2. Fetched prices: python scripts/fetch_prices.py")
         print("  3. Loaded macro data: python scripts/fetch_macro.py")
         return 1
+    finally:
+        pipeline.close()
     
     return 0
 
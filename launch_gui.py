@@ -9,7 +9,6 @@ Or directly:
     streamlit run app.py
 """
 
-import os
 import sys
 from pathlib import Path
 
@@ -38,7 +37,10 @@ def main():
     print("Opening browser at http://localhost:8501")
     print("\nPress Ctrl+C to stop\n")
     
-    os.system("streamlit run app.py")
+    # Run in this process rather than shelling out to a second interpreter
+    from streamlit.web import bootstrap
+    bootstrap.load_config_options(flag_options={})
+    bootstrap.run(str(Path("app.py").resolve()), False, [], {})
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,17 @@
 import sqlite3
 from datetime import datetime, timedelta
-import random
+import numpy as np
 
 # Connect to database
 conn = sqlite3.connect('data/finance.db')
 cursor = conn.cursor()
 
+# Bulk-load settings (WAL matches what the app uses); all inserts below run
+# in one transaction, committed once at the end
+conn.execute("PRAGMA journal_mode=WAL")
+conn.execute("PRAGMA synchronous=NORMAL")
+conn.execute("PRAGMA temp_store=MEMORY")
+
 # Insert test symbols
 print("Loading test symbols...")
 test_symbols = [
@@ -21,14 +27,12 @@ test_symbols = [
     ('WMT', 'Walmart Inc', 'equity', 'Consumer Defensive', 'Discount Stores', '400000000000'),
 ]
 
-for symbol, name, asset_class, sector, industry, market_cap in test_symbols:
-    cursor.execute("""
-        INSERT OR REPLACE INTO symbols 
-        (symbol, name, asset_class, sector, industry, market_cap)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, [symbol, name, asset_class, sector, industry, market_cap])
+cursor.executemany("""
+    INSERT OR REPLACE INTO symbols 
+    (symbol, name, asset_class, sector, industry, market_cap)
+    VALUES (?, ?, ?, ?, ?, ?)
+""", test_symbols)
 
-conn.commit()
 print(f"✓ Loaded {len(test_symbols)} test symbols")
 
 # Generate sample price data
@@ -39,29 +43,37 @@ base_prices = {
     'V': 250, 'WMT': 170
 }
 
-records = 0
-for days_ago in range(90, -1, -1):
-    date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
-    
-    for symbol, base_price in base_prices.items():
-        variation = random.uniform(-0.05, 0.05)
-        price = base_price * (1 + variation)
-        
-        open_price = price * random.uniform(0.98, 1.02)
-        high_price = max(open_price, price) * random.uniform(1.0, 1.03)
-        low_price = min(open_price, price) * random.uniform(0.97, 1.0)
-        volume = int(random.uniform(50000000, 150000000))
-        
-        cursor.execute("""
-            INSERT OR REPLACE INTO daily_prices 
-            (symbol, timestamp, open, high, low, close, volume)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, [symbol, date, open_price, high_price, low_price, price, volume])
-        
-        records += 1
+# One (day, symbol) grid per field: 91 days x 10 symbols, drawn in one call each
+dates = [(datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+         for days_ago in range(90, -1, -1)]
+symbols = list(base_prices)
+shape = (len(dates), len(symbols))
+rng = np.random.default_rng()
 
-conn.commit()
-print(f"✓ Generated {records} price records")
+price = np.array(list(base_prices.values()), dtype=float) * (1 + rng.uniform(-0.05, 0.05, shape))
+open_price = price * rng.uniform(0.98, 1.02, shape)
+high_price = np.maximum(open_price, price) * rng.uniform(1.0, 1.03, shape)
+low_price = np.minimum(open_price, price) * rng.uniform(0.97, 1.0, shape)
+volume = rng.uniform(50000000, 150000000, shape).astype(np.int64)
+
+# tolist() hands sqlite3 plain Python floats/ints
+price_rows = list(zip(
+    symbols * len(dates),
+    np.repeat(dates, len(symbols)).tolist(),
+    open_price.ravel().tolist(),
+    high_price.ravel().tolist(),
+    low_price.ravel().tolist(),
+    price.ravel().tolist(),
+    volume.ravel().tolist(),
+))
+
+cursor.executemany("""
+    INSERT OR REPLACE INTO daily_prices 
+    (symbol, timestamp, open, high, low, close, volume)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+""", price_rows)
+
+print(f"✓ Generated {len(price_rows)} price records")
 
 # Add macro data
 print("Loading macro indicators...")
@@ -72,12 +84,11 @@ macro_data = [
     ('CPIAUCSL', '2024-12-01', 308.5, 'monthly'),
 ]
 
-for indicator, date, value, frequency in macro_data:
-    cursor.execute("""
-        INSERT OR REPLACE INTO macro_data 
-        (indicator, date, value, frequency)
-        VALUES (?, ?, ?, ?)
-    """, [indicator, date, value, frequency])
+cursor.executemany("""
+    INSERT OR REPLACE INTO macro_data 
+    (indicator, date, value, frequency)
+    VALUES (?, ?, ?, ?)
+""", macro_data)
 
 conn.commit()
 print(f"✓ Loaded {len(macro_data)} macro indicators")
@@ -86,6 +97,10 @@ print(f"✓ Loaded {len(macro_data)} macro indicators")
 symbol_count = cursor.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
 price_count = cursor.execute("SELECT COUNT(*) FROM daily_prices").fetchone()[0]
 macro_count = cursor.execute("SELECT COUNT(*) FROM macro_data").fetchone()[0]
+tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master")}
+if 'symbols_fts' in tables:
+    # Raises if the REPLACEs above left the app's search index out of sync
+    cursor.execute("INSERT INTO symbols_fts(symbols_fts, rank) VALUES ('integrity-check', 1)")
 
 print("\n" + "="*50)
 print("✅ TEST DATA LOADED SUCCESSFULLY!")
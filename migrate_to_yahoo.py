@@ -115,35 +115,12 @@ def main():
     print("STARTING MIGRATION")
     print("=" * 80)
     
-    success_count = 0
-    fail_count = 0
-    failed_symbols = []
-    
-    for i, symbol in enumerate(symbols, 1):
-        print(f"\n[{i}/{len(symbols)}] Migrating {symbol}...")
-        
-        try:
-            # Clear old data
-            print(f"  [DEL] Clearing old data...")
-            pipeline.query("DELETE FROM daily_prices WHERE symbol = ?", [symbol])
-            
-            # Fetch from Yahoo Finance
-            print(f"  [FETCH] Fetching from Yahoo Finance...")
-            pipeline.fetch_prices_yahoo(symbol, period=period)
-            
-            # Verify
-            latest = pipeline.get_latest_price(symbol)
-            if latest:
-                print(f"  [OK] Success! Latest price: ${latest:.2f}")
-                success_count += 1
-            else:
-                print(f"  [WARN] Fetched but no price data")
-                success_count += 1
-                
-        except Exception as e:
-            print(f"  [FAIL] Failed: {e}")
-            fail_count += 1
-            failed_symbols.append(symbol)
+    # Batched multi-ticker downloads; each chunk's old data is cleared in the
+    # same transaction that writes its new rows
+    loaded = pipeline.refetch_all_symbols_yahoo(symbols, period=period)
+    success_count = len(loaded)
+    failed_symbols = [s for s in symbols if s not in loaded]
+    fail_count = len(failed_symbols)
     
     # Summary
     print("\n" + "=" * 80)
@@ -166,7 +143,8 @@ def main():
     
     # Cleanup old API calls
     print("\n6. Cleaning up old Alpha Vantage API logs...")
-    pipeline.query("DELETE FROM api_calls WHERE source = 'alpha_vantage'")
+    with pipeline.batch() as conn:
+        conn.execute("DELETE FROM api_calls WHERE source = 'alpha_vantage'")
     print("[OK] Cleanup complete")
     
     pipeline.close()
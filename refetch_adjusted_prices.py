@@ -14,7 +14,6 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from src.pipeline import FinancePipeline
 from datetime import datetime
-import time
 
 
 def main():
@@ -68,21 +67,11 @@ def main():
     print("STARTING REFETCH")
     print("=" * 60)
 
-    success_count = 0
-    failed_symbols = []
-
-    for i, symbol in enumerate(symbols, 1):
-        print(f"\n[{i}/{len(symbols)}] {symbol}...")
-
-        try:
-            pipeline.clear_symbol_prices(symbol)
-            pipeline.fetch_prices_yahoo(symbol, period=period)
-            success_count += 1
-            time.sleep(0.5)  # Be nice to Yahoo
-
-        except Exception as e:
-            print(f"    FAILED: {e}")
-            failed_symbols.append((symbol, str(e)))
+    # Batched multi-ticker downloads; old rows are only dropped per chunk,
+    # in the same transaction that writes the new ones
+    loaded = pipeline.refetch_all_symbols_yahoo(symbols, period=period)
+    success_count = len(loaded)
+    failed_symbols = [s for s in symbols if s not in loaded]
 
     # Summary
     print("\n" + "=" * 60)
@@ -96,9 +85,7 @@ def main():
         print("Refresh your Streamlit app to see the corrected data.")
 
     if failed_symbols:
-        print("\nFailed symbols:")
-        for sym, err in failed_symbols:
-            print(f"  {sym}: {err}")
+        print(f"\nFailed symbols: {', '.join(failed_symbols)}")
 
     pipeline.close()
 
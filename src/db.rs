@@ -1697,6 +1697,10 @@ impl Database {
 
 /// Database schema SQL
 const SCHEMA_SQL: &str = r#"
+-- Must precede the first table and journal_mode=WAL; lets free pages be
+-- released without a full VACUUM (no effect on an existing database)
+PRAGMA auto_vacuum = INCREMENTAL;
+
 -- Symbol master table
 CREATE TABLE IF NOT EXISTS symbols (
     symbol TEXT PRIMARY KEY,
@@ -10,13 +10,170 @@ Benefits:
 - More reliable
 """
 
+import atexit
 import sqlite3
 import pandas as pd
 import json
 import os
+import re
+import threading
+import weakref
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from itertools import chain, repeat
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+
+# Rows ANALYZE samples per index (0 = every row). Approximate statistics are
+# plenty for the planner and keep ANALYZE time flat as tables grow.
+ANALYSIS_LIMIT = 400
+
+# Applied to every new SQLite connection. WAL lets Dashboard reads run
+# alongside fetch writes; the rest trade a little durability/memory for speed.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",   # 256 MB
+    "PRAGMA cache_size=-64000",     # ~64 MB
+    "PRAGMA busy_timeout=5000",
+    f"PRAGMA analysis_limit={ANALYSIS_LIMIT}",  # bounds PRAGMA optimize
+)
+
+# Authorizer actions a read-only (SQL Editor) statement may perform; anything
+# else, ATTACH/DETACH and transaction control included, is denied
+READONLY_ACTIONS = frozenset({
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+})
+
+# Argument-taking PRAGMAs that only report schema (anything else with an
+# argument sets a value)
+READONLY_PRAGMAS = frozenset({
+    'table_info', 'table_xinfo', 'index_list', 'index_info', 'index_xinfo',
+    'foreign_key_list',
+})
+
+# Full-text index over the searchable symbol columns (external content, so
+# the text itself lives only in `symbols`). Writers such as the Rust apps use
+# INSERT OR REPLACE with recursive_triggers off, so the replaced row's delete
+# fires no trigger: symbols_fts_bi stashes that row and symbols_fts_ai drops
+# its index entry. An ignored insert never reaches symbols_fts_ai and its
+# stash is discarded by the next one; with recursive_triggers on,
+# symbols_fts_ad handles the entry and clears the stash instead.
+SYMBOLS_FTS_SQL = """
+    CREATE VIRTUAL TABLE symbols_fts USING fts5(
+        symbol, name, sector, industry,
+        content='symbols', content_rowid='rowid'
+    );
+    CREATE TABLE symbols_fts_replaced (
+        rowid INTEGER PRIMARY KEY, symbol TEXT, name TEXT, sector TEXT, industry TEXT
+    );
+    CREATE TRIGGER symbols_fts_bi BEFORE INSERT ON symbols BEGIN
+        DELETE FROM symbols_fts_replaced;
+        INSERT INTO symbols_fts_replaced (rowid, symbol, name, sector, industry)
+        SELECT rowid, symbol, name, sector, industry FROM symbols WHERE symbol = new.symbol;
+    END;
+    CREATE TRIGGER symbols_fts_ai AFTER INSERT ON symbols BEGIN
+        INSERT INTO symbols_fts(symbols_fts, rowid, symbol, name, sector, industry)
+        SELECT 'delete', rowid, symbol, name, sector, industry FROM symbols_fts_replaced;
+        DELETE FROM symbols_fts_replaced;
+        INSERT INTO symbols_fts(rowid, symbol, name, sector, industry)
+        VALUES (new.rowid, new.symbol, new.name, new.sector, new.industry);
+    END;
+    CREATE TRIGGER symbols_fts_ad AFTER DELETE ON symbols BEGIN
+        INSERT INTO symbols_fts(symbols_fts, rowid, symbol, name, sector, industry)
+        VALUES ('delete', old.rowid, old.symbol, old.name, old.sector, old.industry);
+        DELETE FROM symbols_fts_replaced WHERE rowid = old.rowid;
+    END;
+    CREATE TRIGGER symbols_fts_au AFTER UPDATE ON symbols BEGIN
+        INSERT INTO symbols_fts(symbols_fts, rowid, symbol, name, sector, industry)
+        VALUES ('delete', old.rowid, old.symbol, old.name, old.sector, old.industry);
+        INSERT INTO symbols_fts(rowid, symbol, name, sector, industry)
+        VALUES (new.rowid, new.symbol, new.name, new.sector, new.industry);
+    END;
+    INSERT INTO symbols_fts(symbols_fts) VALUES ('rebuild');
+"""
+
+# Trigger-maintained row counts, so the Dashboard reads two rows instead of
+# scanning daily_prices with COUNT(*). INSERT OR REPLACE with recursive_triggers
+# off (the Rust apps, raw scripts) deletes the old row without a DELETE
+# trigger, so the BEFORE INSERT trigger notes in `replacing` whether the key
+# already exists and the AFTER INSERT trigger adds 1 - replacing. With
+# recursive_triggers on, the DELETE trigger subtracts the old row and resets
+# the flag. An ignored insert leaves a stale flag the next insert overwrites.
+ROW_COUNTS_SQL = """
+    CREATE TABLE row_counts (
+        table_name TEXT PRIMARY KEY,
+        n INTEGER NOT NULL,
+        replacing INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT INTO row_counts (table_name, n)
+    SELECT 'symbols', COUNT(*) FROM symbols
+    UNION ALL SELECT 'daily_prices', COUNT(*) FROM daily_prices;
+    CREATE TRIGGER row_counts_symbols_bi BEFORE INSERT ON symbols BEGIN
+        UPDATE row_counts
+        SET replacing = EXISTS (SELECT 1 FROM symbols WHERE symbol = new.symbol)
+        WHERE table_name = 'symbols';
+    END;
+    CREATE TRIGGER row_counts_symbols_ai AFTER INSERT ON symbols BEGIN
+        UPDATE row_counts SET n = n + 1 - replacing, replacing = 0
+        WHERE table_name = 'symbols';
+    END;
+    CREATE TRIGGER row_counts_symbols_ad AFTER DELETE ON symbols BEGIN
+        UPDATE row_counts SET n = n - 1, replacing = 0 WHERE table_name = 'symbols';
+    END;
+    CREATE TRIGGER row_counts_prices_bi BEFORE INSERT ON daily_prices BEGIN
+        UPDATE row_counts
+        SET replacing = EXISTS (SELECT 1 FROM daily_prices
+                                WHERE symbol = new.symbol AND timestamp = new.timestamp)
+        WHERE table_name = 'daily_prices';
+    END;
+    CREATE TRIGGER row_counts_prices_ai AFTER INSERT ON daily_prices BEGIN
+        UPDATE row_counts SET n = n + 1 - replacing, replacing = 0
+        WHERE table_name = 'daily_prices';
+    END;
+    CREATE TRIGGER row_counts_prices_ad AFTER DELETE ON daily_prices BEGIN
+        UPDATE row_counts SET n = n - 1, replacing = 0 WHERE table_name = 'daily_prices';
+    END;
+"""
+
+# Prepared statements kept per connection (sqlite3 default is 128); the app
+# re-issues the same handful of queries on every Streamlit rerun
+STATEMENT_CACHE_SIZE = 256
+
+# Indexes the app's hot queries rely on, ensured at connect so databases
+# created from an older schema.sql pick them up too
+CONNECTION_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_prices_timestamp ON daily_prices(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_symbols_asset_class ON symbols(asset_class)",
+    "CREATE INDEX IF NOT EXISTS idx_symbols_sector ON symbols(sector)",
+    "CREATE INDEX IF NOT EXISTS idx_api_calls_ts_source ON api_calls(timestamp, source)",
+)
+
+# Symbols per yf.download() request when refetching a whole database
+REFETCH_CHUNK_SIZE = 50
+
+INSERT_PRICE_SQL = """
+    INSERT OR REPLACE INTO daily_prices
+    (symbol, timestamp, open, high, low, close, volume, source)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Pipelines with an open connection. Long-lived app connections are never
+# closed explicitly, so one exit hook disconnects whichever are still alive;
+# the weak references let discarded pipelines be collected meanwhile.
+_open_pipelines: "weakref.WeakSet[FinancePipeline]" = weakref.WeakSet()
+
+
+@atexit.register
+def _disconnect_open_pipelines():
+    for pipeline in list(_open_pipelines):
+        pipeline.disconnect()
 
 
 class FinancePipeline:
@@ -27,6 +184,14 @@ class FinancePipeline:
         self.config = self._load_config(config_path)
         self.db_path = self.config['database']['path']
         self.conn = None
+        self.readonly_conn = None
+        self.has_symbols_fts = False
+        self.has_row_counts = False
+        self.page_size = None
+        self._sector_cache_symbols = None
+        self._in_batch = False
+        self._api_log: List[tuple] = []
+        self._api_log_lock = threading.Lock()
         
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from JSON file"""
@@ -43,60 +208,380 @@ class FinancePipeline:
             return json.load(f)
     
     def connect(self):
-        """Establish database connection"""
+        """Establish database connection (reused once open)"""
+        if self.conn is not None:
+            return self.conn
+
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                    cached_statements=STATEMENT_CACHE_SIZE)
         self.conn.row_factory = sqlite3.Row
+        _open_pipelines.add(self)
+        self._configure_connection(self.conn)
+        self.page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        tables = self._table_names(self.conn)
+        self._ensure_indexes(self.conn)
+        self._ensure_symbols_fts(self.conn, tables)
+        self._ensure_row_counts(self.conn, tables)
+        # Recommended once per long-lived connection: analyze any table
+        # whose statistics are missing or out of date
+        self.conn.execute("PRAGMA optimize=0x10002")
+        if 'symbols' in tables and 'sectors_top8' not in tables:
+            self.refresh_sector_cache()
         return self.conn
+
+    def _configure_connection(self, conn: sqlite3.Connection):
+        """Apply performance PRAGMAs to a freshly opened connection"""
+        if conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+            # New, empty file: auto_vacuum only sticks if set before
+            # journal_mode=WAL writes the header, so it must come first
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+
+    @staticmethod
+    def _table_names(conn: sqlite3.Connection) -> set:
+        """Names of all tables (including virtual tables) in the database"""
+        return {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )}
+
+    def _ensure_indexes(self, conn: sqlite3.Connection):
+        """
+        Create any missing CONNECTION_INDEXES (skipped if the table is absent)
+        and refresh planner statistics when one was added
+        """
+        count_sql = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index'"
+        before = conn.execute(count_sql).fetchone()[0]
+        for ddl in CONNECTION_INDEXES:
+            try:
+                conn.execute(ddl)
+            except sqlite3.OperationalError:
+                pass
+        if conn.execute(count_sql).fetchone()[0] != before:
+            conn.execute("ANALYZE")
+        conn.commit()
+
+    def _ensure_symbols_fts(self, conn: sqlite3.Connection, tables: set):
+        """Create the symbols_fts search index on first use (needs FTS5)"""
+        if 'symbols_fts' not in tables and 'symbols' in tables:
+            try:
+                conn.executescript("BEGIN;" + SYMBOLS_FTS_SQL + "COMMIT;")
+                tables.add('symbols_fts')
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                print(f"[WARN] Full-text symbol search unavailable: {e}")
+        self.has_symbols_fts = 'symbols_fts' in tables
+
+    def _ensure_row_counts(self, conn: sqlite3.Connection, tables: set):
+        """Create and seed the row_counts table and its triggers on first use"""
+        if 'row_counts' not in tables and {'symbols', 'daily_prices'} <= tables:
+            try:
+                conn.executescript("BEGIN;" + ROW_COUNTS_SQL + "COMMIT;")
+                tables.add('row_counts')
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                print(f"[WARN] Row count triggers unavailable: {e}")
+        self.has_row_counts = 'row_counts' in tables
+
+    @staticmethod
+    def fts_match_query(term: str) -> Optional[str]:
+        """
+        Turn free-text search input into an FTS5 MATCH expression
+        
+        Every word becomes a quoted prefix term, so "appl tech" matches
+        symbols with a token starting "appl" and one starting "tech".
+        Returns None when the input has no searchable words.
+        """
+        words = re.findall(r'\w+', term)
+        if not words:
+            return None
+        return ' '.join(f'"{w}"*' for w in words)
+    
+    def check_symbols_fts(self) -> bool:
+        """
+        Run FTS5's integrity-check on symbols_fts against the symbols table
+        
+        Returns False if the index has drifted from its content; see
+        rebuild_symbols_fts().
+        """
+        conn = self.connect()
+        if not self.has_symbols_fts:
+            return True
+        try:
+            conn.execute("INSERT INTO symbols_fts(symbols_fts, rank) "
+                         "VALUES ('integrity-check', 1)")
+        except sqlite3.DatabaseError as e:
+            print(f"[WARN] symbols_fts integrity check failed: {e}")
+            return False
+        finally:
+            self._commit()
+        return True
+    
+    def rebuild_symbols_fts(self):
+        """Re-index every row of symbols into symbols_fts"""
+        conn = self.connect()
+        if self.has_symbols_fts:
+            conn.execute("INSERT INTO symbols_fts(symbols_fts) VALUES ('rebuild')")
+            self._commit()
     
     def disconnect(self):
-        """Close database connection"""
+        """Close database connection, refreshing planner statistics first"""
         if self.conn:
+            try:
+                self._flush_api_log()
+                self.conn.commit()
+                # Cheap unless the query mix has changed; re-analyzes only
+                # tables whose stats would help the queries that ran
+                self.conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
             self.conn.close()
             self.conn = None
+        if self.readonly_conn:
+            self.readonly_conn.close()
+            self.readonly_conn = None
+    
+    @contextmanager
+    def batch(self):
+        """
+        Group several writes into a single transaction
+        
+        Pipeline methods called inside the block skip their own commits;
+        everything is committed once on exit (one fsync) or rolled back if
+        the block raises. Nested batches join the outer one.
+        """
+        conn = self.connect()
+        if self._in_batch:
+            yield conn
+            return
+        
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        self._in_batch = True
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            self._flush_api_log()
+            conn.commit()
+        finally:
+            self._in_batch = False
+    
+    def _commit(self):
+        """Commit pending writes unless an enclosing batch() will"""
+        self._flush_api_log()
+        if not self._in_batch:
+            self.conn.commit()
     
-    def query(self, sql: str, params: Optional[List] = None) -> pd.DataFrame:
+    def query(self, sql: str, params: Optional[List] = None,
+              dtype_backend: Optional[str] = None) -> pd.DataFrame:
         """
         Execute SQL query and return DataFrame
         
         Args:
             sql: SQL query string
             params: Optional parameters for parameterized queries
+            dtype_backend: Optional pandas dtype backend; 'pyarrow' gives
+                Arrow-backed columns, much smaller for wide text results
         """
         self.connect()
+        kwargs = {'dtype_backend': dtype_backend} if dtype_backend else {}
         
         if params:
-            return pd.read_sql_query(sql, self.conn, params=params)
+            return pd.read_sql_query(sql, self.conn, params=params, **kwargs)
         else:
-            return pd.read_sql_query(sql, self.conn)
+            return pd.read_sql_query(sql, self.conn, **kwargs)
+    
+    def query_raw(self, sql: str, params: Optional[List] = None) -> Tuple[List[tuple], List[str]]:
+        """
+        Execute SQL query and return plain tuples, skipping pandas
+        
+        Meant for small results (a scalar, a short list) where building a
+        DataFrame would cost more than the query itself.
+        
+        Returns:
+            (rows, column_names)
+        """
+        cursor = self.connect().cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(sql, params or []).fetchall()
+        return rows, [col[0] for col in cursor.description or ()]
+    
+    def executemany(self, sql: str, seq_of_params) -> int:
+        """
+        Run one write statement for every parameter row
+        
+        The statement is prepared once and re-bound per row, and the rows are
+        committed together (or left to an enclosing batch()).
+        
+        Returns:
+            Number of rows changed
+        """
+        conn = self.connect()
+        cursor = conn.executemany(sql, seq_of_params)
+        self._commit()
+        return cursor.rowcount
+    
+    def query_readonly(self, sql: str, max_rows: Optional[int] = None,
+                       dtype_backend: Optional[str] = None) -> Tuple[pd.DataFrame, bool]:
+        """
+        Execute untrusted SQL on a read-only connection
+        
+        Only reads are authorized: writes (INSERT/UPDATE/DELETE, DDL, PRAGMA
+        assignments), ATTACH/DETACH and transaction control raise a database
+        error instead of touching any file.
+        
+        Args:
+            sql: SQL query string
+            max_rows: Stop reading after this many rows (None = no cap)
+            dtype_backend: Optional pandas dtype backend (see query())
+        
+        Returns:
+            (DataFrame, truncated) where truncated means rows were left unread
+        """
+        if self.readonly_conn is None:
+            self.connect()  # creates the database file and schema extras
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            readonly_conn = sqlite3.connect(uri, uri=True, timeout=5,
+                                            check_same_thread=False)
+            # mode=ro alone still allows ATTACH (which can create files and
+            # write to them) and a pending write on the attached main file
+            readonly_conn.execute("PRAGMA query_only=ON")
+            readonly_conn.set_authorizer(self._readonly_authorizer)
+            self.readonly_conn = readonly_conn
+        kwargs = {'dtype_backend': dtype_backend} if dtype_backend else {}
+        
+        if max_rows is None:
+            return pd.read_sql_query(sql, self.readonly_conn, **kwargs), False
+        
+        # Chunked read: only the first max_rows rows are ever materialized
+        chunks = pd.read_sql_query(sql, self.readonly_conn, chunksize=max_rows, **kwargs)
+        try:
+            df = next(chunks)
+            truncated = next(chunks, None) is not None
+        finally:
+            chunks.close()
+        return df, truncated
+    
+    @staticmethod
+    def _readonly_authorizer(action, arg1, arg2, db_name, source):
+        """set_authorizer() callback for readonly_conn: reads only"""
+        if action in READONLY_ACTIONS:
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_PRAGMA and (arg2 is None or arg1.lower() in READONLY_PRAGMAS):
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_UPDATE and arg1 == 'sqlite_master':
+            # Opening a virtual table (symbols_fts) is authorized as an
+            # UPDATE of sqlite_master; query_only still refuses a real one
+            return sqlite3.SQLITE_OK
+        return sqlite3.SQLITE_DENY
     
     def log_api_call(self, source: str, endpoint: str = '', symbol: str = ''):
-        """Log an API call for tracking"""
-        self.connect()
-        cursor = self.conn.cursor()
+        """
+        Log an API call for tracking
         
-        cursor.execute("""
-            INSERT INTO api_calls (source, endpoint, symbol, timestamp)
-            VALUES (?, ?, ?, ?)
-        """, [source, endpoint, symbol, datetime.now().isoformat()])
+        The row is buffered and written with the pipeline's next commit (the
+        fetch that made the call always commits its data), so logging adds
+        no commit of its own.
+        """
+        with self._api_log_lock:
+            self._api_log.append((source, endpoint, symbol, datetime.now().isoformat()))
+    
+    def _flush_api_log(self):
+        """Write buffered api_calls rows into the current transaction"""
+        with self._api_log_lock:
+            if self._api_log:
+                self.connect().executemany("""
+                    INSERT INTO api_calls (source, endpoint, symbol, timestamp)
+                    VALUES (?, ?, ?, ?)
+                """, self._api_log)
+                self._api_log.clear()
+    
+    def _buffered_api_calls(self, source: str, cutoff: str) -> int:
+        """Logged calls for source since cutoff that are not written yet"""
+        with self._api_log_lock:
+            return sum(1 for row in self._api_log
+                       if row[0] == source and row[3] >= cutoff)
+    
+    def clear_api_calls(self):
+        """
+        Delete all API call history
         
-        self.conn.commit()
+        Drops and recreates the table (and its indexes) from its own stored
+        DDL, which frees whole pages instead of journaling every row.
+        """
+        conn = self.connect()
+        ddl = [row[0] for row in conn.execute("""
+            SELECT sql FROM sqlite_master
+            WHERE tbl_name = 'api_calls' AND sql IS NOT NULL
+            ORDER BY type = 'index'
+        """)]
+        
+        with self._api_log_lock:
+            self._api_log.clear()
+        with self.batch():
+            conn.execute("DROP TABLE api_calls")
+            for statement in ddl:
+                conn.execute(statement)
+        self.optimize()
     
     def get_api_usage(self, source: str, hours: int = 24) -> int:
-        """Get API call count for a source within time window"""
+        """Get API call count for a source within time window (including unflushed calls)"""
         self.connect()
         
         cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()
         
-        df = self.query("""
+        rows, _ = self.query_raw("""
             SELECT COUNT(*) as count
             FROM api_calls
             WHERE source = ?
             AND timestamp >= ?
         """, [source, cutoff])
         
-        return int(df['count'].iloc[0]) if not df.empty else 0
-    
+        return int(rows[0][0]) + self._buffered_api_calls(source, cutoff)
+
+    def dashboard_stats(self, api_source: str = 'yahoo_finance', hours: int = 24) -> Dict[str, Any]:
+        """
+        Get all Dashboard summary figures in a single query
+
+        Args:
+            api_source: Source whose API calls are counted
+            hours: Time window for the API call count
+
+        Returns:
+            Dict with sym, prices, eq, etf, crypto, latest and api_calls keys
+        """
+        conn = self.connect()
+
+        cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()
+
+        if self.has_row_counts:
+            sym_sql = "SELECT n FROM row_counts WHERE table_name = 'symbols'"
+            prices_sql = "SELECT n FROM row_counts WHERE table_name = 'daily_prices'"
+        else:
+            sym_sql = "SELECT COUNT(*) FROM symbols"
+            prices_sql = "SELECT COUNT(*) FROM daily_prices"
+
+        row = conn.execute(f"""
+            SELECT
+                ({sym_sql}) as sym,
+                ({prices_sql}) as prices,
+                (SELECT COUNT(*) FROM symbols WHERE asset_class = 'equity') as eq,
+                (SELECT COUNT(*) FROM symbols WHERE asset_class = 'etf') as etf,
+                (SELECT COUNT(*) FROM symbols WHERE asset_class = 'crypto') as crypto,
+                (SELECT DATE(MAX(timestamp)) FROM daily_prices) as latest,
+                (SELECT COUNT(*) FROM api_calls
+                 WHERE source = ? AND timestamp >= ?) as api_calls
+        """, [api_source, cutoff]).fetchone()
+
+        stats = dict(row)
+        stats['api_calls'] += self._buffered_api_calls(api_source, cutoff)
+        return stats
+
     def fetch_prices_yahoo(self, symbol: str, period: str = "1y"):
         """
         Fetch daily prices from Yahoo Finance using yfinance
@@ -129,71 +614,109 @@ class FinancePipeline:
         
         # Insert data into database
         conn = self.connect()
-        cursor = conn.cursor()
+        rows = self._price_rows(symbol, df)
+        conn.executemany(INSERT_PRICE_SQL, rows)
+        count = len(rows)
         
-        count = 0
-        for date, row in df.iterrows():
-            # Yahoo Finance returns adjusted data by default
-            cursor.execute("""
-                INSERT OR REPLACE INTO daily_prices 
-                (symbol, timestamp, open, high, low, close, volume, source)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, [
-                symbol,
-                date.strftime('%Y-%m-%d'),
-                float(row['Open']),
-                float(row['High']),
-                float(row['Low']),
-                float(row['Close']),  # Already adjusted!
-                int(row['Volume']),
-                'yahoo_finance'
-            ])
-            count += 1
-        
-        conn.commit()
+        self._commit()
         print(f"[OK] Loaded {count} records for {symbol}")
         
         # No delay needed - Yahoo Finance has no rate limits!
     
-    def fetch_prices_batch_yahoo(self, symbols: List[str], period: str = "1y"):
+    def fetch_prices_batch_yahoo(self, symbols: List[str], period: str = "1y",
+                                 replace: bool = False) -> Dict[str, int]:
         """
         Fetch prices for multiple symbols at once (FAST!)
         
-        This is MUCH faster than Alpha Vantage because:
-        - No rate limits
-        - Can download multiple symbols in parallel
+        Issues a single multi-ticker yf.download() (threaded inside yfinance)
+        and writes all rows with one executemany() in one transaction,
+        instead of one request and one commit per symbol. The download
+        happens before the transaction opens, so no write lock is held
+        while waiting on the network.
         
         Args:
             symbols: List of stock symbols
             period: Time period for all symbols
+            replace: Delete existing prices first, but only for symbols that
+                returned data (symbols that came back empty keep their history)
+        
+        Returns:
+            Dict mapping each symbol that returned data to its record count
         """
+        print(f"[FETCH] Batch fetching {len(symbols)} symbols from Yahoo Finance...")
+        print(f"Period: {period}")
+        print("=" * 60)
+        
+        rows_by_symbol = self._download_prices_yahoo(symbols, period)
+        loaded = self._store_prices(rows_by_symbol, replace=replace)
+        
+        failed = [s for s in symbols if s not in loaded]
+        
+        print(f"[OK] Batch fetch complete!")
+        print(f"  Success: {len(loaded)}/{len(symbols)} ({sum(loaded.values())} records)")
+        print(f"  Failed: {len(failed)}/{len(symbols)}")
+        if failed:
+            print(f"  No data: {', '.join(failed)}")
+        
+        return loaded
+    
+    def _download_prices_yahoo(self, symbols: List[str], period: str) -> Dict[str, List[tuple]]:
+        """Download several symbols with one yf.download(); maps symbol -> daily_prices rows"""
         try:
             import yfinance as yf
         except ImportError:
             raise ImportError("yfinance not installed. Run: pip install yfinance")
         
-        print(f"[FETCH] Batch fetching {len(symbols)} symbols from Yahoo Finance...")
-        print(f"Period: {period}")
-        print("=" * 60)
+        data = yf.download(symbols, period=period, group_by='ticker',
+                           auto_adjust=True, threads=True, progress=False)
+        
+        # Log API call
+        self.log_api_call('yahoo_finance', 'download', ','.join(symbols))
         
-        success_count = 0
-        fail_count = 0
+        rows_by_symbol = {}
+        multi_ticker = isinstance(data.columns, pd.MultiIndex)
         
-        for i, symbol in enumerate(symbols, 1):
-            print(f"\n[{i}/{len(symbols)}] {symbol}...", end=" ")
+        for symbol in symbols:
+            if multi_ticker:
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            elif len(symbols) == 1 and not data.empty:
+                frame = data
+            else:
+                continue
             
-            try:
-                self.fetch_prices_yahoo(symbol, period)
-                success_count += 1
-                print("[OK]")
-            except Exception as e:
-                print(f"[FAIL] {e}")
-                fail_count += 1
+            frame = frame.dropna(subset=['Close'])
+            if frame.empty:
+                continue
+            
+            rows_by_symbol[symbol] = self._price_rows(symbol, frame)
         
-        print("\n" + "=" * 60)
-        print(f"[OK] Batch fetch complete!")
-        print(f"  Success: {success_count}/{len(symbols)}")
-        print(f"  Failed: {fail_count}/{len(symbols)}")
+        return rows_by_symbol
+    
+    def _store_prices(self, rows_by_symbol: Dict[str, List[tuple]],
+                      replace: bool = False) -> Dict[str, int]:
+        """Write downloaded price rows in one short transaction; returns record counts"""
+        with self.batch() as conn:
+            if replace and rows_by_symbol:
+                self.clear_prices(list(rows_by_symbol))
+            conn.executemany(INSERT_PRICE_SQL, chain.from_iterable(rows_by_symbol.values()))
+        return {symbol: len(rows) for symbol, rows in rows_by_symbol.items()}
+    
+    @staticmethod
+    def _price_rows(symbol: str, df: pd.DataFrame) -> List[tuple]:
+        """Build daily_prices rows from a yfinance OHLCV frame"""
+        # Yahoo Finance returns adjusted data by default
+        return list(zip(
+            repeat(symbol),
+            df.index.strftime('%Y-%m-%d'),
+            df['Open'].astype(float).tolist(),
+            df['High'].astype(float).tolist(),
+            df['Low'].astype(float).tolist(),
+            df['Close'].astype(float).tolist(),  # Already adjusted!
+            df['Volume'].fillna(0).astype('int64').tolist(),
+            repeat('yahoo_finance')
+        ))
     
     def fetch_fred(self, indicator: str):
         """
@@ -202,6 +725,37 @@ class FinancePipeline:
         Args:
             indicator: FRED series ID (e.g., 'GDP', 'UNRATE', 'DFF')
         """
+        self._store_fred(indicator, self._download_fred(indicator))
+    
+    def fetch_fred_many(self, indicators: List[str]) -> Iterator[Tuple[str, Optional[Exception]]]:
+        """
+        Fetch several FRED series with the downloads running concurrently
+        
+        Downloads go through a thread pool sized by features.max_workers;
+        rows are written on the calling thread as each one finishes, so the
+        connection is never shared between threads.
+        
+        Args:
+            indicators: FRED series IDs
+        
+        Yields:
+            (indicator, error) in completion order; error is None on success
+        """
+        workers = self.config.get('features', {}).get('max_workers', 4)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self._download_fred, ind): ind for ind in indicators}
+            for future in as_completed(futures):
+                indicator = futures[future]
+                try:
+                    self._store_fred(indicator, future.result())
+                except Exception as e:
+                    yield indicator, e
+                else:
+                    yield indicator, None
+    
+    @staticmethod
+    def _download_fred(indicator: str) -> pd.DataFrame:
+        """Download one FRED series as a (date, value) DataFrame"""
         import requests
         
         # FRED API (no key required for basic access)
@@ -212,23 +766,29 @@ class FinancePipeline:
         
         # Parse CSV
         from io import StringIO
-        df = pd.read_csv(StringIO(response.text))
+        return pd.read_csv(StringIO(response.text))
+    
+    def _store_fred(self, indicator: str, df: pd.DataFrame):
+        """Insert a downloaded FRED series into macro_data"""
+        # FRED marks missing observations with '.' or a blank; skip them
+        values = pd.to_numeric(df.iloc[:, 1], errors='coerce')
+        present = values.notna()
+        rows = list(zip(
+            repeat(indicator),
+            df.iloc[:, 0][present].astype(str).tolist(),
+            values[present].astype(float).tolist(),
+            repeat('FRED')
+        ))
         
-        # Insert into database
-        conn = self.connect()
-        cursor = conn.cursor()
+        # Own short transaction: a failed insert rolls back the whole series
+        with self.batch() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO macro_data 
+                (indicator, date, value, source)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+        count = len(rows)
         
-        count = 0
-        for _, row in df.iterrows():
-            if pd.notna(row.iloc[1]):  # Skip null values
-                cursor.execute("""
-                    INSERT OR REPLACE INTO macro_data 
-                    (indicator, date, value, source)
-                    VALUES (?, ?, ?, ?)
-                """, [indicator, row.iloc[0], float(row.iloc[1]), 'FRED'])
-                count += 1
-        
-        conn.commit()
         print(f"[OK] Loaded {count} records for {indicator}")
     
     def load_symbols(self, json_path: str):
@@ -236,17 +796,8 @@ class FinancePipeline:
         with open(json_path, 'r') as f:
             data = json.load(f)
         
-        conn = self.connect()
-        cursor = conn.cursor()
-        
-        count = 0
-        for symbol, info in data.items():
-            cursor.execute("""
-                INSERT OR REPLACE INTO symbols 
-                (symbol, name, sector, industry, market_cap, country, exchange, 
-                 currency, isin, asset_class)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, [
+        rows = [
+            (
                 symbol,
                 info.get('name'),
                 info.get('sector'),
@@ -257,15 +808,70 @@ class FinancePipeline:
                 info.get('currency'),
                 info.get('isin'),
                 info.get('asset_class', 'equity')
-            ])
-            count += 1
+            )
+            for symbol, info in data.items()
+        ]
         
-        conn.commit()
+        # One prepared statement and one transaction for the whole file
+        with self.batch() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO symbols 
+                (symbol, name, sector, industry, market_cap, country, exchange, 
+                 currency, isin, asset_class)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+        count = len(rows)
+        
+        self.refresh_sector_cache()
         print(f"[OK] Loaded {count} symbols")
     
+    def _symbols_row_count(self) -> Optional[int]:
+        """Trigger-maintained symbols row count (None without row_counts)"""
+        if not self.has_row_counts:
+            return None
+        rows, _ = self.query_raw("SELECT n FROM row_counts WHERE table_name = 'symbols'")
+        return rows[0][0] if rows else None
+    
+    def refresh_sector_cache_if_stale(self) -> bool:
+        """
+        Rebuild sectors_top8 if the symbols row count differs from the one
+        it was last built from here. Catches symbols written by other
+        processes (sync_symbols.py, the Rust apps) without a full GROUP BY
+        on every read.
+        
+        Returns:
+            True if the cache was rebuilt
+        """
+        self.connect()
+        count = self._symbols_row_count()
+        if count is not None and count == self._sector_cache_symbols:
+            return False
+        self.refresh_sector_cache()
+        return True
+    
+    def refresh_sector_cache(self):
+        """
+        Rebuild sectors_top8, the precomputed top-8 sector counts shown on
+        the Dashboard. Call after bulk changes to the symbols table.
+        """
+        conn = self.connect()
+        self._sector_cache_symbols = self._symbols_row_count()
+        conn.execute("CREATE TABLE IF NOT EXISTS sectors_top8 (sector TEXT, count INTEGER)")
+        conn.execute("DELETE FROM sectors_top8")
+        conn.execute("""
+            INSERT INTO sectors_top8 (sector, count)
+            SELECT sector, COUNT(*) AS count
+            FROM symbols
+            WHERE sector IS NOT NULL AND sector != ''
+            GROUP BY sector
+            ORDER BY count DESC
+            LIMIT 8
+        """)
+        self._commit()
+    
     def get_latest_price(self, symbol: str) -> Optional[float]:
         """Get most recent price for a symbol"""
-        df = self.query("""
+        rows, _ = self.query_raw("""
             SELECT close
             FROM daily_prices
             WHERE symbol = ?
@@ -273,7 +879,7 @@ class FinancePipeline:
             LIMIT 1
         """, [symbol])
         
-        return float(df['close'].iloc[0]) if not df.empty else None
+        return float(rows[0][0]) if rows else None
     
     def create_watchlist(self, name: str, symbols: List[str]):
         """Create or update a watchlist"""
@@ -298,39 +904,191 @@ class FinancePipeline:
                 VALUES (?, ?)
             """, [watchlist_id, symbol])
         
-        conn.commit()
+        self._commit()
     
     def get_watchlist(self, name: str) -> List[str]:
         """Get symbols in a watchlist"""
-        df = self.query("""
+        rows, _ = self.query_raw("""
             SELECT ws.symbol
             FROM watchlists w
             JOIN watchlist_symbols ws ON w.id = ws.watchlist_id
             WHERE w.name = ?
         """, [name])
         
-        return df['symbol'].tolist() if not df.empty else []
+        return [row[0] for row in rows]
+    
+    def delete_watchlist(self, name: str):
+        """Delete a watchlist and its symbols"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            DELETE FROM watchlist_symbols
+            WHERE watchlist_id IN (SELECT id FROM watchlists WHERE name = ?)
+        """, [name])
+        cursor.execute("DELETE FROM watchlists WHERE name = ?", [name])
+        
+        self._commit()
     
     def backup(self, backup_dir: str = "data/backups") -> str:
-        """Create database backup"""
+        """
+        Create database backup
+        
+        Uses VACUUM INTO, which writes a compacted, consistent copy (including
+        changes still in the WAL) in a single pass over the database.
+        """
+        conn = self.connect()
+        if conn.in_transaction:
+            conn.commit()
+        return self._backup(conn, backup_dir)
+    
+    @staticmethod
+    def _backup(conn: sqlite3.Connection, backup_dir: str) -> str:
+        """Backup work shared by backup() and maintenance()"""
         os.makedirs(backup_dir, exist_ok=True)
         
+        # VACUUM INTO refuses to overwrite, so two backups within the same
+        # second (Backup button then Full Maintenance) need distinct names
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_path = f"{backup_dir}/finance_{timestamp}.db"
+        suffix = 1
+        while os.path.exists(backup_path):
+            backup_path = f"{backup_dir}/finance_{timestamp}_{suffix}.db"
+            suffix += 1
         
-        # Copy database
-        import shutil
-        shutil.copy2(self.db_path, backup_path)
+        if sqlite3.sqlite_version_info >= (3, 27, 0):
+            conn.execute("VACUUM INTO ?", [backup_path])
+        else:
+            # Online backup API: also consistent, just not compacted
+            target = sqlite3.connect(backup_path)
+            try:
+                conn.backup(target)
+            finally:
+                target.close()
         
         return backup_path
     
     def vacuum(self):
         """Optimize database (reclaim space, rebuild indexes)"""
-        self.connect()
-        cursor = self.conn.cursor()
+        self._vacuum(self.connect())
+    
+    @staticmethod
+    def _vacuum(conn: sqlite3.Connection):
+        """Vacuum work shared by vacuum() and maintenance()"""
+        cursor = conn.cursor()
+        # Takes effect with this rewrite, enabling incremental_vacuum() afterwards
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
         cursor.execute("VACUUM")
         cursor.execute("ANALYZE")
-        self.conn.commit()
+        conn.commit()
+    
+    def maintenance(self, vacuum: bool = True, backup_dir: str = "data/backups") -> str:
+        """
+        Vacuum, refresh statistics and back up, in the recommended order
+        
+        VACUUM (which re-analyzes) comes first, or just a statistics refresh
+        when vacuum=False; the backup of the compacted file comes last. Runs
+        on a short-lived connection of its own, like optimize(own_connection=True),
+        so it can go to a worker thread. Returns the backup path.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            if vacuum:
+                self._vacuum(conn)
+            else:
+                self._analyze(conn, False, ANALYSIS_LIMIT, fresh=True)
+                conn.commit()
+            return self._backup(conn, backup_dir)
+        finally:
+            conn.close()
+    
+    def schema_version(self) -> int:
+        """SQLite's schema cookie; changes whenever a table, index or trigger does"""
+        return self.connect().execute("PRAGMA schema_version").fetchone()[0]
+    
+    def db_size(self) -> int:
+        """
+        Logical database size in bytes (page_count x page_size)
+        
+        Unlike the file size on disk this already counts pages that are
+        still in the WAL and not yet checkpointed into the main file.
+        """
+        conn = self.connect()
+        return conn.execute("PRAGMA page_count").fetchone()[0] * self.page_size
+    
+    def free_pages(self) -> Tuple[int, int]:
+        """(free, total) page counts; free pages are the space VACUUM can reclaim"""
+        conn = self.connect()
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        total = conn.execute("PRAGMA page_count").fetchone()[0]
+        return free, total
+    
+    def incremental_vacuum(self, pages: int = 0) -> bool:
+        """
+        Return free pages to the filesystem without rewriting the database
+        
+        Needs auto_vacuum=INCREMENTAL: set on databases this pipeline or the
+        Rust apps create, and on any other after one full vacuum(). pages=0
+        releases them all.
+        Returns False when the database is not in incremental mode.
+        """
+        conn = self.connect()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return False
+        # executescript steps the pragma to completion; execute() frees one page
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        return True
+    
+    def optimize(self, full: bool = False, own_connection: bool = False,
+                 analysis_limit: int = ANALYSIS_LIMIT) -> bool:
+        """
+        Refresh query planner statistics
+        
+        By default runs PRAGMA optimize, which only re-analyzes tables whose
+        statistics are missing or stale (usually a near no-op). full=True
+        runs ANALYZE over every table and index instead.
+        
+        analysis_limit caps the rows sampled per index (0 = no cap, an exact
+        but O(rows) pass). own_connection=True does the work on a short-lived
+        connection of its own, so it can run on a worker thread while the app
+        keeps querying.
+        
+        Returns True if any statistics were refreshed.
+        """
+        if own_connection:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                refreshed = self._analyze(conn, full, analysis_limit, fresh=True)
+                conn.commit()
+            finally:
+                conn.close()
+            return refreshed
+        
+        conn = self.connect()
+        refreshed = self._analyze(conn, full, analysis_limit)
+        self._commit()
+        return refreshed
+    
+    @staticmethod
+    def _analyze(conn: sqlite3.Connection, full: bool, analysis_limit: int,
+                 fresh: bool = False) -> bool:
+        """Statistics work shared by optimize(); True if anything was analyzed"""
+        conn.execute(f"PRAGMA analysis_limit={int(analysis_limit)}")
+        try:
+            # A new connection has run no queries for PRAGMA optimize to go
+            # on; only 3.46+ can be told to check every table (0x10000)
+            if full or (fresh and sqlite3.sqlite_version_info < (3, 46, 0)):
+                conn.execute("ANALYZE")
+                return True
+            # 0x1 lists the ANALYZE statements instead of running them, so
+            # we can tell whether there was anything to do
+            flags = 0x10003 if fresh else 0x3
+            statements = [row[0] for row in conn.execute(f"PRAGMA optimize={flags}")]
+            for statement in statements:
+                conn.execute(statement)
+            return bool(statements)
+        finally:
+            conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
     
     def close(self):
         """Alias for disconnect()"""
@@ -341,50 +1099,62 @@ class FinancePipeline:
         conn = self.connect()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM daily_prices WHERE symbol = ?", [symbol])
-        conn.commit()
+        self._commit()
         print(f"[OK] Cleared price data for {symbol}")
     
-    def refetch_all_symbols_yahoo(self, symbols: List[str] = None, period: str = '1y'):
+    def clear_prices(self, symbols: List[str]):
+        """Delete all price data for several symbols in a single statement"""
+        conn = self.connect()
+        placeholders = ",".join("?" * len(symbols))
+        conn.execute(f"DELETE FROM daily_prices WHERE symbol IN ({placeholders})", symbols)
+        self._commit()
+    
+    def refetch_all_symbols_yahoo(self, symbols: List[str] = None,
+                                  period: str = '1y') -> Dict[str, int]:
         """
         Refetch data for multiple symbols using Yahoo Finance
         
+        Symbols go out REFETCH_CHUNK_SIZE at a time through
+        fetch_prices_batch_yahoo(replace=True). Each chunk is downloaded
+        first; only the symbols that returned data have their old rows
+        cleared, in the same transaction that writes the new ones. A failed
+        download, or a symbol that comes back empty, keeps its old data.
+        
         Args:
             symbols: List of symbols to refetch (if None, refetches all symbols with existing data)
             period: Time period - "1y", "2y", "5y", "10y", "max"
+        
+        Returns:
+            Dict mapping each refetched symbol to its record count
         """
         if symbols is None:
             # Get all symbols that have price data
-            df = self.query("SELECT DISTINCT symbol FROM daily_prices")
-            symbols = df['symbol'].tolist()
+            rows, _ = self.query_raw("SELECT DISTINCT symbol FROM daily_prices")
+            symbols = [row[0] for row in rows]
         
         if not symbols:
             print("[WARN] No symbols to refetch")
-            return
+            return {}
         
         print(f"[REFETCH] Refetching {len(symbols)} symbols from Yahoo Finance...")
         print(f"Period: {period}")
         print("=" * 60)
         
-        success_count = 0
-        fail_count = 0
+        loaded = {}
         
-        for i, symbol in enumerate(symbols, 1):
-            print(f"\n[{i}/{len(symbols)}] {symbol}...")
+        for start in range(0, len(symbols), REFETCH_CHUNK_SIZE):
+            chunk = symbols[start:start + REFETCH_CHUNK_SIZE]
+            print(f"\n[{start + len(chunk)}/{len(symbols)}] {', '.join(chunk)}")
             
             try:
-                # Clear old data
-                self.clear_symbol_prices(symbol)
-                
-                # Fetch new data from Yahoo Finance
-                self.fetch_prices_yahoo(symbol, period=period)
-                success_count += 1
-                
+                loaded.update(self.fetch_prices_batch_yahoo(chunk, period=period, replace=True))
             except Exception as e:
                 print(f"  [FAIL] Failed: {e}")
-                fail_count += 1
         
         print("\n" + "=" * 60)
         print(f"[OK] Refetch complete!")
-        print(f"  Success: {success_count}")
-        print(f"  Failed: {fail_count}")
+        print(f"  Success: {len(loaded)}")
+        print(f"  Failed: {len(symbols) - len(loaded)}")
         print(f"  Total: {len(symbols)}")
+        
+        return loaded
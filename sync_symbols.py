@@ -38,20 +38,17 @@ def main():
     for sym in missing_symbols:
         print(f"  - {sym}")
 
-    # Insert missing symbols
-    cursor = pipeline.conn.cursor()
-    count = 0
-
-    for symbol in missing_symbols:
-        cursor.execute("""
-            INSERT OR IGNORE INTO symbols (symbol, name, asset_class)
-            VALUES (?, ?, 'equity')
-        """, [symbol, symbol])
-        count += 1
-
-    pipeline.conn.commit()
+    # Insert missing symbols: one prepared statement, one commit
+    count = pipeline.executemany("""
+        INSERT OR IGNORE INTO symbols (symbol, name, asset_class)
+        VALUES (?, ?, 'equity')
+    """, [(symbol, symbol) for symbol in missing_symbols])
 
     print(f"\nAdded {count} symbols to the database.")
+    if not pipeline.check_symbols_fts():
+        print("Rebuilding the symbol search index...")
+        pipeline.rebuild_symbols_fts()
+    pipeline.refresh_sector_cache()
     print("=" * 60)
 
     return 0